@@ -11,6 +11,16 @@ from config import DEFAULT_USERS, DASHBOARDS, ROLE_DISPLAY
 users_db = DEFAULT_USERS.copy()
 
 
+def _user_info(username):
+    """User data returned to the app (no password)"""
+    return {
+        "username": username,
+        "role": users_db[username]["role"],
+        "name": users_db[username]["name"],
+        "dashboards": users_db[username]["dashboards"]
+    }
+
+
 def authenticate(username, password):
     """
     Authenticate user with username and password
@@ -18,15 +28,31 @@ def authenticate(username, password):
     """
     if username in users_db:
         if users_db[username]["password"] == password:
-            return {
-                "username": username,
-                "role": users_db[username]["role"],
-                "name": users_db[username]["name"],
-                "dashboards": users_db[username]["dashboards"]
-            }
+            return _user_info(username)
     return None
 
 
+def login_session(user):
+    """Remember the user in the Flask session (checked by plain Flask routes such as exports)"""
+    from flask import session
+    session["username"] = user["username"]
+
+
+def logout_session():
+    """Forget the user in the Flask session"""
+    from flask import session
+    session.pop("username", None)
+
+
+def get_session_user():
+    """Get user data for the Flask session's user, or None if not logged in"""
+    from flask import session
+    username = session.get("username")
+    if username not in users_db:
+        return None
+    return _user_info(username)
+
+
 def is_admin(user):
     """Check if user is admin"""
     if user:
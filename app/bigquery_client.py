@@ -5,34 +5,102 @@ BigQuery Client for Variant Analytics Dashboard (Dash Version)
 - Optimized queries
 """
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import io
 import os
-from functools import lru_cache
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 import hashlib
+import inspect
 
 from config import (
     BIGQUERY_FULL_TABLE, 
+    BQ_INCREMENTAL_LOOKBACK_DAYS,
+    BQ_INCREMENTAL_REFRESH,
+    BQ_STORAGE_MAX_STREAMS,
     CACHE_TTL,
     GCS_ACTIVE_CACHE,
     GCS_STAGING_CACHE,
     GCS_BQ_REFRESH_METADATA,
     GCS_GCS_REFRESH_METADATA,
+    GCS_METADATA_TTL,
+    GCS_PARQUET_LAYOUT,
+    GCS_VERSION_CHECK_INTERVAL,
+    LOCAL_MASTER_CACHE,
+    MASTER_FLOAT32_RATES,
+    METRIC_COLUMN_BUDGET_BYTES,
+    METRICS_CONFIG,
+    RESULT_CACHE_MAX_BYTES,
 )
 
 GCS_BUCKET_NAME = os.environ.get("GCS_CACHE_BUCKET", "")
+LOCAL_CACHE_DIR = os.environ.get("LOCAL_CACHE_DIR", "/tmp/variant_cache")
+# Size of each ranged read when streaming Parquet from GCS
+GCS_READ_CHUNK_SIZE = 8 * 1024 * 1024
+# Max rows per row group when writing clustered Parquet
+PARQUET_ROW_GROUP_SIZE = 128 * 1024
 DEBUG = True
 
+# Columns the master table is partitioned on at load time
+PARTITION_KEYS = ["Active_Inactive", "Table", "BC", "Cohort"]
+# Low-cardinality string columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ["App_Name", "Plan_Name", "Cohort", "Active_Inactive", "Table"]
+# Columns read eagerly on load; every other column is a metric read on first use
+DIMENSION_COLUMNS = ["Reporting_Date", "App_Name", "Plan_Name", "BC", "Cohort", "Active_Inactive", "Table"]
+# Schema metadata flag set once a table is sorted for partitioning
+PARTITION_SORTED_KEY = b"variant.partition_sorted"
+# Schema metadata holding the GCS generation a snapshot was loaded from
+SNAPSHOT_GENERATION_KEY = b"variant.gcs_generation"
+
 # App-level cache
 _app_cache = {
     "data": None,
+    "partitions": None,
+    "dimensions": None,
+    "columns": None,
     "loaded_at": None,
+    "version": 0,
 }
 
+# _load_lock makes master data loads single-flight; _app_cache_lock guards swaps
+_load_lock = threading.Lock()
+_app_cache_lock = threading.Lock()
+
+# Guards the lazily loaded metric columns of the current snapshot
+_metric_columns_lock = threading.Lock()
+
+# Filter-keyed cache of pivot/chart payloads (LRU, bounded by bytes)
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+_result_cache_stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+# Background reload of the master data (stale-while-revalidate)
+RELOAD_RETRY_INTERVAL = 300
+_reload_thread = None
+_reload_thread_lock = threading.Lock()
+_reload_running = False
+_reload_pending = False
+
+# Rate-limited polling of the active cache object's generation
+_last_version_check = None
+_version_check_lock = threading.Lock()
+_last_reload_failure = None
+
 # Lazy imports for Google Cloud libraries
 _bigquery_client = None
 _storage_client = None
 
+# Cache bucket handle (resolved once) and refresh timestamps (short TTL)
+_gcs_bucket = None
+_gcs_bucket_resolved = False
+_gcs_bucket_lock = threading.Lock()
+_refresh_timestamps = {"values": {}, "fetched_at": None}
+_refresh_timestamps_lock = threading.Lock()
+
 
 def log_debug(message):
     if DEBUG:
@@ -75,27 +143,34 @@ def log_debug(message):
 # =============================================================================
 
 def get_gcs_bucket():
+    """Get the cache bucket, resolved once per process"""
+    global _gcs_bucket, _gcs_bucket_resolved
     if not GCS_BUCKET_NAME:
         return None
-    try:
-        client = _get_storage_client()
-        if client is None:
+    if _gcs_bucket_resolved:
+        return _gcs_bucket
+    with _gcs_bucket_lock:
+        if _gcs_bucket_resolved:
+            return _gcs_bucket
+        try:
+            client = _get_storage_client()
+            if client is None:
+                return None
+            bucket = client.bucket(GCS_BUCKET_NAME)
+            _gcs_bucket = bucket if bucket.exists() else None
+            _gcs_bucket_resolved = True
+            return _gcs_bucket
+        except Exception as e:
+            log_debug(f"GCS error: {e}")
             return None
-        bucket = client.bucket(GCS_BUCKET_NAME)
-        return bucket if bucket.exists() else None
-    except Exception as e:
-        log_debug(f"GCS error: {e}")
-        return None
 
 
 def get_metadata_timestamp(bucket, metadata_file):
     if bucket is None:
         return None
     try:
-        blob = bucket.blob(metadata_file)
-        if not blob.exists():
-            return None
-        return datetime.fromisoformat(blob.download_as_text().strip())
+        # A missing object raises NotFound, so no separate exists() round-trip
+        return datetime.fromisoformat(bucket.blob(metadata_file).download_as_text().strip())
     except:
         return None
 
@@ -107,42 +182,148 @@ def set_metadata_timestamp(bucket, metadata_file, timestamp=None):
         if timestamp is None:
             timestamp = datetime.now(timezone.utc)
         bucket.blob(metadata_file).upload_from_string(timestamp.isoformat())
+        with _refresh_timestamps_lock:
+            _refresh_timestamps["values"][metadata_file] = timestamp
         return True
     except:
         return False
 
 
-def load_parquet_from_gcs(bucket, cache_file):
+def get_refresh_timestamps():
+    """
+    Get the BQ and GCS refresh timestamps, cached for GCS_METADATA_TTL seconds
+    
+    Both metadata files are read concurrently on a cache miss; refreshes
+    made by this process update the cache directly.
+    
+    Returns:
+        Dict of metadata file -> timestamp (None if never refreshed)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    metadata_files = [GCS_BQ_REFRESH_METADATA, GCS_GCS_REFRESH_METADATA]
+    now = time.monotonic()
+    with _refresh_timestamps_lock:
+        fetched_at = _refresh_timestamps["fetched_at"]
+        if fetched_at is not None and now - fetched_at < GCS_METADATA_TTL:
+            return dict(_refresh_timestamps["values"])
+    
+    bucket = get_gcs_bucket()
+    if bucket is None:
+        return {metadata_file: None for metadata_file in metadata_files}
+    
+    with ThreadPoolExecutor(max_workers=len(metadata_files)) as pool:
+        timestamps = list(pool.map(lambda name: get_metadata_timestamp(bucket, name), metadata_files))
+    
+    with _refresh_timestamps_lock:
+        _refresh_timestamps["values"] = dict(zip(metadata_files, timestamps))
+        _refresh_timestamps["fetched_at"] = now
+        return dict(_refresh_timestamps["values"])
+
+
+def get_gcs_generation(bucket, cache_file):
+    """Get the generation number of a GCS object (metadata-only read)"""
     if bucket is None:
         return None
     try:
-        import pyarrow.parquet as pq
+        blob = bucket.get_blob(cache_file)
+        return blob.generation if blob is not None else None
+    except Exception as e:
+        log_debug(f"GCS generation error: {e}")
+        return None
+
+
+def filter_expression(filters):
+    """
+    Build a dataset filter expression from equality filters
+    
+    Args:
+        filters: Dict of column -> list of allowed values, or an existing
+                 pyarrow.compute.Expression (returned as is)
+    
+    Returns:
+        Expression, or None if there is nothing to filter on
+    """
+    import pyarrow.compute as pc
+    
+    if filters is None or isinstance(filters, pc.Expression):
+        return filters
+    
+    expression = None
+    for column, values in filters.items():
+        condition = pc.field(column).isin(list(values))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_parquet_from_gcs(bucket, cache_file, generation=None, columns=None, filters=None):
+    """
+    Stream a Parquet file from GCS
+    
+    The footer and row groups are fetched with ranged reads, so the whole
+    compressed file is never held in memory. Row groups whose statistics
+    exclude the filters are skipped, and the remaining ones are decoded
+    on Arrow's thread pool with the filter pushed down to the scan.
+    
+    Args:
+        columns: Columns to read (all if None)
+        filters: Dict of column -> list of allowed values,
+                 e.g. {"Active_Inactive": ["Active"]}, or a pc.field expression
+    """
+    if bucket is None:
+        return None
+    try:
+        import pyarrow.dataset as ds
         
-        blob = bucket.blob(cache_file)
+        blob = bucket.blob(cache_file, generation=generation)
         if not blob.exists():
             return None
         
         log_debug(f"Loading from GCS: {cache_file}")
         start = datetime.now()
         
-        parquet_bytes = blob.download_as_bytes()
-        table = pq.read_table(io.BytesIO(parquet_bytes))
+        expression = filter_expression(filters)
+        
+        with blob.open("rb", chunk_size=GCS_READ_CHUNK_SIZE) as source:
+            file_format = ds.ParquetFileFormat()
+            fragment = file_format.make_fragment(source)
+            schema = fragment.physical_schema
+            
+            # Row groups whose statistics rule out the filter are never fetched
+            row_groups = fragment.split_by_row_group(expression) if expression is not None else [fragment]
+            dataset = ds.FileSystemDataset(row_groups, schema, file_format)
+            table = dataset.to_table(columns=columns, filter=expression, use_threads=True)
+            table = table.replace_schema_metadata(schema.metadata)
+            total_row_groups = fragment.num_row_groups
         
-        log_debug(f"GCS load: {table.num_rows} rows in {(datetime.now() - start).total_seconds():.2f}s")
+        log_debug(
+            f"GCS load: {table.num_rows} rows from {sum(f.num_row_groups for f in row_groups)}/{total_row_groups} row groups "
+            f"in {(datetime.now() - start).total_seconds():.2f}s"
+        )
         return table
     except Exception as e:
         log_debug(f"GCS load error: {e}")
         return None
 
 
-def save_parquet_to_gcs(bucket, cache_file, data):
+def save_parquet_to_gcs(bucket, cache_file, data, layout=GCS_PARQUET_LAYOUT):
+    """
+    Write a table to GCS as Parquet
+    
+    layout="clustered" writes row groups clustered by partition keys (see
+    _write_clustered_parquet) so readers can prune by filter predicate;
+    layout="flat" writes the table as-is with default row groups.
+    """
     if bucket is None:
         return False
     try:
         import pyarrow.parquet as pq
         
         buffer = io.BytesIO()
-        pq.write_table(data, buffer, compression='snappy')
+        if layout == "clustered":
+            _write_clustered_parquet(data, buffer)
+        else:
+            pq.write_table(data, buffer, compression='snappy')
         buffer.seek(0)
         bucket.blob(cache_file).upload_from_file(buffer, content_type='application/octet-stream')
         return True
@@ -151,15 +332,136 @@ def save_parquet_to_gcs(bucket, cache_file, data):
         return False
 
 
+# =============================================================================
+# LOCAL SNAPSHOT (shared across gunicorn workers)
+# =============================================================================
+
+def _local_cache_path():
+    return os.path.join(LOCAL_CACHE_DIR, LOCAL_MASTER_CACHE)
+
+
+@contextmanager
+def _local_cache_lock():
+    """Cross-process lock so only one worker builds the local snapshot"""
+    lock_file = None
+    try:
+        import fcntl
+        os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
+        lock_file = open(f"{_local_cache_path()}.lock", "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    except (ImportError, OSError) as e:
+        log_debug(f"Local cache lock unavailable: {e}")
+    try:
+        yield
+    finally:
+        # Closing the file releases the lock
+        if lock_file is not None:
+            lock_file.close()
+
+
+def _is_local_snapshot_fresh(path):
+    """Check if the local snapshot exists and is younger than CACHE_TTL"""
+    try:
+        age = datetime.now().timestamp() - os.path.getmtime(path)
+    except OSError:
+        return False
+    return age < CACHE_TTL
+
+
+def _stamp_generation(data, generation):
+    """Record the GCS generation a snapshot came from in its schema metadata"""
+    if generation is None:
+        return data
+    metadata = dict(data.schema.metadata or {})
+    metadata[SNAPSHOT_GENERATION_KEY] = str(generation).encode()
+    return data.replace_schema_metadata(metadata)
+
+
+def get_snapshot_generation(data):
+    """Get the GCS generation recorded in a snapshot, if any"""
+    if data is None:
+        return None
+    value = (data.schema.metadata or {}).get(SNAPSHOT_GENERATION_KEY)
+    return int(value) if value else None
+
+
+def read_arrow_columns(source, columns=None):
+    """
+    Read columns from a memory-mapped Arrow IPC snapshot (zero-copy)
+    
+    The whole file is read as buffers over the map and then projected:
+    IpcReadOptions(included_fields) would copy the file to the heap.
+    
+    Args:
+        source: Memory-mapped file returned by load_arrow_from_local
+        columns: Column names to read; all columns if None
+    """
+    import pyarrow as pa
+    
+    table = pa.ipc.open_file(source).read_all()
+    return table if columns is None else table.select(columns)
+
+
+def load_arrow_from_local(path, columns=None):
+    """
+    Memory-map a local Arrow IPC snapshot (zero-copy, pages shared across workers)
+    
+    The returned map keeps the file that was opened, so columns read from it
+    later stay consistent even if another worker swaps in a new snapshot.
+    
+    Returns:
+        (table, memory-mapped file), or (None, None) if there is no readable snapshot
+    """
+    if not os.path.exists(path):
+        return None, None
+    try:
+        import pyarrow as pa
+        
+        start = datetime.now()
+        source = pa.memory_map(path)
+        table = read_arrow_columns(source, columns)
+        
+        log_debug(
+            f"Local map: {table.num_rows} rows, {table.num_columns} columns "
+            f"in {(datetime.now() - start).total_seconds():.2f}s"
+        )
+        return table, source
+    except Exception as e:
+        log_debug(f"Local load error: {e}")
+        return None, None
+
+
+def save_arrow_to_local(path, data):
+    """Write an uncompressed Arrow IPC (Feather v2) snapshot, swapped in by atomic rename"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        import pyarrow.feather as feather
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        feather.write_feather(data, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        log_debug(f"Local save error: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
 # =============================================================================
 # BIGQUERY LOADER
 # =============================================================================
 
-def load_from_bigquery():
-    """Load data from BigQuery"""
+def load_from_bigquery(since=None):
+    """
+    Load data from BigQuery
+    
+    Args:
+        since: Only load rows with Reporting_Date on or after this date
+    """
     from google.cloud import bigquery
     
-    log_debug("Loading from BigQuery...")
+    log_debug(f"Loading from BigQuery{f' since {since}' if since else ''}...")
     start = datetime.now()
     
     client = _get_bigquery_client()
@@ -190,13 +492,101 @@ def load_from_bigquery():
         FROM `{BIGQUERY_FULL_TABLE}`
     """
     
-    job_config = bigquery.QueryJobConfig(use_query_cache=True)
-    result = client.query(query, job_config=job_config).to_arrow()
+    query_parameters = []
+    if since is not None:
+        query += "    WHERE Reporting_Date >= @since\n"
+        query_parameters.append(bigquery.ScalarQueryParameter("since", "DATE", since))
+    
+    job_config = bigquery.QueryJobConfig(use_query_cache=True, query_parameters=query_parameters)
+    job = client.query(query, job_config=job_config)
+    job.result()
+    
+    read_start = datetime.now()
+    result = _read_job_with_storage_api(client, job)
+    if result is None:
+        result = job.to_arrow()
     
-    log_debug(f"BigQuery: {result.num_rows} rows in {(datetime.now() - start).total_seconds():.2f}s")
+    read_seconds = max((datetime.now() - read_start).total_seconds(), 1e-6)
+    log_debug(
+        f"BigQuery: {result.num_rows} rows in {(datetime.now() - start).total_seconds():.2f}s "
+        f"(read {result.num_rows / read_seconds:,.0f} rows/s, {result.nbytes / read_seconds / 1e6:,.1f} MB/s)"
+    )
     return result
 
 
+def read_streams_to_arrow(stream_names, read_stream, schema=None, max_workers=BQ_STORAGE_MAX_STREAMS):
+    """
+    Read several streams in parallel into one Arrow table
+    
+    Args:
+        stream_names: Names of the streams to read
+        read_stream: Callable taking a stream name and yielding RecordBatches
+                     (a Storage Read API stream, or any local stand-in)
+        schema: Schema of the result; taken from the first batch if None
+    
+    Returns:
+        Table assembled from the batches without copying them
+    """
+    import pyarrow as pa
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if not stream_names:
+        return schema.empty_table() if schema is not None else None
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(stream_names)))) as pool:
+        results = list(pool.map(lambda name: list(read_stream(name)), stream_names))
+    
+    batches = [batch for stream_batches in results for batch in stream_batches]
+    if schema is None:
+        if not batches:
+            return None
+        schema = batches[0].schema
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def _read_job_with_storage_api(client, job):
+    """
+    Read a finished query's result table through parallel Storage Read API streams
+    
+    Returns None if google-cloud-bigquery-storage is unavailable or the
+    read session cannot be created, so the caller can fall back.
+    """
+    try:
+        import pyarrow as pa
+        from google.cloud import bigquery_storage
+        from google.cloud.bigquery_storage import types
+    except ImportError as e:
+        log_debug(f"BigQuery Storage API not available: {e}")
+        return None
+    
+    try:
+        destination = job.destination
+        bqstorage_client = bigquery_storage.BigQueryReadClient()
+        requested_session = types.ReadSession(
+            table=f"projects/{destination.project}/datasets/{destination.dataset_id}/tables/{destination.table_id}",
+            data_format=types.DataFormat.ARROW,
+        )
+        session = bqstorage_client.create_read_session(
+            parent=f"projects/{client.project}",
+            read_session=requested_session,
+            max_stream_count=BQ_STORAGE_MAX_STREAMS,
+        )
+    except Exception as e:
+        log_debug(f"BigQuery Storage read session error: {e}")
+        return None
+    
+    schema = pa.ipc.read_schema(pa.py_buffer(session.arrow_schema.serialized_schema))
+    stream_names = [stream.name for stream in session.streams]
+    log_debug(f"BigQuery Storage: reading {len(stream_names)} streams")
+    
+    def read_stream(stream_name):
+        reader = bqstorage_client.read_rows(stream_name)
+        for page in reader.rows(session).pages:
+            yield page.to_arrow()
+    
+    return read_streams_to_arrow(stream_names, read_stream, schema)
+
+
 # =============================================================================
 # MASTER DATA LOADER
 # =============================================================================
@@ -209,254 +599,907 @@ def _is_cache_valid():
     return age < CACHE_TTL
 
 
-def get_master_data():
-    """Get master data with caching"""
-    global _app_cache
+def _decode_dictionaries(table):
+    """Cast dictionary-encoded columns back to their value type"""
+    import pyarrow as pa
     
-    # Level 1: App-level cache
-    if _is_cache_valid():
-        log_debug("Using app-level cache")
-        return _app_cache["data"]
+    fields = [
+        pa.field(field.name, field.type.value_type) if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def normalize_master_table(data):
+    """
+    Store the master table in a compact column encoding
     
-    # Level 2: GCS cache
-    bucket = get_gcs_bucket()
+    Low-cardinality strings are dictionary-encoded, BC becomes int8 and
+    Reporting_Date date32. With MASTER_FLOAT32_RATES the percent metrics
+    are stored as float32. Already-normalized tables are left as they are.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    before = data.nbytes
+    targets = {"BC": pa.int8(), "Reporting_Date": pa.date32()}
+    if MASTER_FLOAT32_RATES:
+        targets.update({
+            metric: pa.float32()
+            for metric, config in METRICS_CONFIG.items() if config.get("format") == "percent"
+        })
+    
+    columns = []
+    for field in data.schema:
+        column = data.column(field.name)
+        if field.name in DICTIONARY_COLUMNS and not pa.types.is_dictionary(field.type):
+            column = pc.dictionary_encode(column)
+        elif field.name in targets and field.type != targets[field.name]:
+            column = pc.cast(column, targets[field.name], safe=field.name != "Reporting_Date")
+        columns.append(column)
+    
+    normalized = pa.Table.from_arrays(columns, names=data.column_names, metadata=data.schema.metadata)
+    normalized = normalized.unify_dictionaries()
+    
+    log_debug(f"Normalized master table: {before / 1e6:,.1f} MB -> {normalized.nbytes / 1e6:,.1f} MB")
+    return normalized
+
+
+def _sort_for_partitions(data):
+    """Sort the master table by partition keys then Reporting_Date (no-op if already sorted)"""
+    import pyarrow.compute as pc
+    
+    metadata = data.schema.metadata or {}
+    if metadata.get(PARTITION_SORTED_KEY) == b"1":
+        return data
+    
+    # Dictionary columns cannot be sorted directly, so sort on decoded keys
+    sort_columns = PARTITION_KEYS + ["Reporting_Date"]
+    keys = _decode_dictionaries(data.select(sort_columns))
+    indices = pc.sort_indices(keys, sort_keys=[(key, "ascending") for key in sort_columns])
+    
+    sorted_data = data.take(indices).unify_dictionaries().combine_chunks()
+    return sorted_data.replace_schema_metadata({**metadata, PARTITION_SORTED_KEY: b"1"})
+
+
+def _partition_bounds(sorted_data):
+    """
+    Locate each partition in a table sorted by _sort_for_partitions
+    
+    Returns:
+        List of ((Active_Inactive, Table, BC, Cohort), offset, row_count)
+    """
+    import pyarrow.compute as pc
+    
+    # Groups come out in first-seen order, which is the sort order here
+    counts = sorted_data.group_by(PARTITION_KEYS, use_threads=False).aggregate(
+        [("Reporting_Date", "count", pc.CountOptions(mode="all"))]
+    )
+    
+    bounds = []
+    offset = 0
+    keys = zip(*[counts.column(key).to_pylist() for key in PARTITION_KEYS])
+    for key, count in zip(keys, counts.column("Reporting_Date_count").to_pylist()):
+        bounds.append((key, offset, count))
+        offset += count
+    return bounds
+
+
+def _build_partition_index(data):
+    """
+    Split the master table into per-partition slices
+    
+    Returns:
+        Dict keyed by (Active_Inactive, Table, BC, Cohort) with the
+        partition's row offset and a zero-copy slice of the table, each
+        sorted by Reporting_Date
+    """
+    start = datetime.now()
+    
+    sorted_data = _sort_for_partitions(data)
+    partitions = {
+        key: (offset, sorted_data.slice(offset, count))
+        for key, offset, count in _partition_bounds(sorted_data)
+    }
+    
+    log_debug(f"Partition index: {len(partitions)} partitions in {(datetime.now() - start).total_seconds():.2f}s")
+    return partitions
+
+
+def _write_clustered_parquet(data, sink):
+    """
+    Write Parquet with one or more row groups per partition
+    
+    Rows are sorted by (Active_Inactive, Table, BC, Cohort, Reporting_Date),
+    string columns are dictionary-encoded and full column statistics are
+    written, so each row group covers a single partition and can be pruned
+    on any of its keys or on the date range.
+    
+    Dictionary columns are written as plain strings in the stored Arrow
+    schema: read back as dictionary fields their statistics are not used
+    for pruning. normalize_master_table re-encodes them on load.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    sorted_data = _decode_dictionaries(_sort_for_partitions(data))
+    string_columns = [
+        field.name for field in sorted_data.schema
+        if pa.types.is_string(field.type) or pa.types.is_dictionary(field.type)
+    ]
+    
+    with pq.ParquetWriter(
+        sink,
+        sorted_data.schema,
+        compression='snappy',
+        use_dictionary=string_columns,
+        write_statistics=True,
+    ) as writer:
+        for _, offset, count in _partition_bounds(sorted_data):
+            writer.write_table(sorted_data.slice(offset, count), row_group_size=PARQUET_ROW_GROUP_SIZE)
+
+
+def _build_dimensions(data, partitions):
+    """
+    Precompute the filter dimensions of a snapshot
+    
+    Returns:
+        Dict with min_date/max_date, plan_groups per Active_Inactive status
+        (sorted App_Name/Plan_Name pairs) and the valid BC and Cohort values
+        per status
+    """
+    import pyarrow.compute as pc
+    
+    bounds = pc.min_max(data.column("Reporting_Date")).as_py()
+    min_date, max_date = bounds["min"], bounds["max"]
+    if hasattr(min_date, 'date'):
+        min_date = min_date.date()
+    if hasattr(max_date, 'date'):
+        max_date = max_date.date()
+    
+    plans = data.group_by(["Active_Inactive", "App_Name", "Plan_Name"]).aggregate([])
+    plans = _decode_dictionaries(plans).sort_by([("Active_Inactive", "ascending"), ("App_Name", "ascending"), ("Plan_Name", "ascending")])
+    statuses = plans.column("Active_Inactive").to_pylist()
+    app_names = plans.column("App_Name").to_pylist()
+    plan_names = plans.column("Plan_Name").to_pylist()
+    
+    plan_groups = {}
+    for status, app, plan in zip(statuses, app_names, plan_names):
+        group = plan_groups.setdefault(status, {"App_Name": [], "Plan_Name": []})
+        group["App_Name"].append(app)
+        group["Plan_Name"].append(plan)
+    
+    # BC and Cohort are partition keys, so their values come from the index
+    bc_values, cohort_values = {}, {}
+    for status, _, bc, cohort in partitions:
+        bc_values.setdefault(status, set()).add(bc)
+        cohort_values.setdefault(status, set()).add(cohort)
+    
+    return {
+        "min_date": min_date,
+        "max_date": max_date,
+        "plan_groups": plan_groups,
+        "bc_values": {status: sorted(values) for status, values in bc_values.items()},
+        "cohort_values": {status: sorted(values) for status, values in cohort_values.items()},
+    }
+
+
+def _new_column_store(data, source, generation=None):
+    """
+    Track the metric columns of a snapshot
+    
+    With a mapped file behind the snapshot, the full table is a zero-copy
+    view of the map. Its pages are shared by the workers; they are not part
+    of any worker's heap and dropping a column frees nothing, so mapped
+    columns are never evicted.
+    
+    Without one (the local snapshot could not be written), the metric
+    columns are on the worker's heap. If the rows can be read again in the
+    same order from the GCS cache object (generation), they are kept in LRU
+    order under METRIC_COLUMN_BUDGET_BYTES; otherwise all of them stay loaded.
+    """
+    if source is not None:
+        table = read_arrow_columns(source)
+        return {
+            "mapped": True,
+            "num_rows": table.num_rows,
+            "schema": table.schema,
+            "table": table,
+            "loaded": OrderedDict(),
+            "bytes": {},
+            "generation": None,
+        }
+    
+    loaded = OrderedDict(
+        (name, data.column(name)) for name in data.column_names if name not in DIMENSION_COLUMNS
+    )
+    return {
+        "mapped": False,
+        "num_rows": data.num_rows,
+        "schema": data.schema,
+        "table": None,
+        "loaded": loaded,
+        "bytes": {name: column.nbytes for name, column in loaded.items()},
+        "generation": generation,
+    }
+
+
+def _read_metric_columns(store, names):
+    """Read evicted metric columns again from the GCS cache object the snapshot was loaded from"""
+    start = datetime.now()
+    table = load_parquet_from_gcs(get_gcs_bucket(), GCS_ACTIVE_CACHE, store["generation"], columns=names)
+    if table is None or table.num_rows != store["num_rows"]:
+        raise RuntimeError(f"Could not reload metric columns {names} from GCS generation {store['generation']}")
+    
+    log_debug(f"Metric columns reloaded: {names} in {(datetime.now() - start).total_seconds():.2f}s")
+    return normalize_master_table(table)
+
+
+def _get_metric_columns(store, names):
+    """
+    Get metric columns of a snapshot
+    
+    Mapped columns are views of the local snapshot; the bytes of those used
+    are recorded for get_cache_info. Heap columns are read again if they
+    were evicted, then the least recently used ones (e.g. BC4_CAC_Ceiling)
+    are dropped while they add up to more than METRIC_COLUMN_BUDGET_BYTES.
+    
+    Returns:
+        Dict of column name to ChunkedArray over the whole snapshot; unknown
+        names are left out
+    """
+    names = [
+        name for name in dict.fromkeys(names)
+        if name not in DIMENSION_COLUMNS and store["schema"].get_field_index(name) >= 0
+    ]
+    
+    with _metric_columns_lock:
+        loaded = store["loaded"]
+        if store["mapped"]:
+            for name in names:
+                if name not in loaded:
+                    loaded[name] = store["table"].column(name)
+                    store["bytes"][name] = loaded[name].nbytes
+            return {name: loaded[name] for name in names}
+        
+        missing = [name for name in names if name not in loaded]
+        if missing:
+            table = _read_metric_columns(store, missing)
+            for name in missing:
+                loaded[name] = table.column(name)
+                store["bytes"][name] = loaded[name].nbytes
+        
+        for name in names:
+            loaded.move_to_end(name)
+        
+        if store["generation"] is not None:
+            while len(loaded) > len(names) and sum(store["bytes"].values()) > METRIC_COLUMN_BUDGET_BYTES:
+                evicted, _ = loaded.popitem(last=False)
+                del store["bytes"][evicted]
+                log_debug(f"Metric column evicted: {evicted}")
+        
+        return {name: loaded[name] for name in names}
+
+
+def _set_master_data(data, source=None, generation=None):
+    """
+    Store master data and its partition index in the app-level cache
+    
+    Only the dimension columns are kept in the cached table; metric columns
+    are fetched through _get_metric_columns. Partition offsets index the
+    sorted table, so unsorted input is sorted first (and is then no longer
+    backed by the mapped file or in the row order of the GCS object).
+    
+    generation is the GCS cache object an unmapped table's rows can be read
+    again from in the same order, if any (see _new_column_store).
+    """
+    global _app_cache, _last_version_check
+    sorted_data = _sort_for_partitions(data)
+    if sorted_data is not data:
+        log_debug("Master data was not partition-sorted; sorted in memory")
+        data, source, generation = sorted_data, None, None
+    columns = _new_column_store(data, source, generation)
+    data = data.select([name for name in data.column_names if name in DIMENSION_COLUMNS])
+    partitions = _build_partition_index(data)
+    dimensions = _build_dimensions(data, partitions)
+    with _app_cache_lock:
+        _app_cache = {
+            "data": data,
+            "partitions": partitions,
+            "dimensions": dimensions,
+            "columns": columns,
+            "loaded_at": datetime.now(),
+            "version": _app_cache["version"] + 1,
+        }
+    clear_result_cache()
+    
+    # A fresh load has just checked the remote generation
+    with _version_check_lock:
+        _last_version_check = time.monotonic()
+
+
+def _load_remote_snapshot(bucket):
+    """Load a fresh copy of the master data from GCS, falling back to BigQuery"""
+    # Level 3: GCS cache
     if bucket:
-        data = load_parquet_from_gcs(bucket, GCS_ACTIVE_CACHE)
-        if data is not None:
-            _app_cache["data"] = data
-            _app_cache["loaded_at"] = datetime.now()
-            return data
+        generation = get_gcs_generation(bucket, GCS_ACTIVE_CACHE)
+        if generation is not None:
+            data = load_parquet_from_gcs(bucket, GCS_ACTIVE_CACHE, generation)
+            if data is not None:
+                return _stamp_generation(normalize_master_table(data), generation)
     
-    # Level 3: BigQuery
+    # Level 4: BigQuery
     log_debug("No cache - loading from BigQuery")
-    data = load_from_bigquery()
-    
-    _app_cache["data"] = data
-    _app_cache["loaded_at"] = datetime.now()
+    data = normalize_master_table(load_from_bigquery())
     
     if bucket:
         save_parquet_to_gcs(bucket, GCS_ACTIVE_CACHE, data)
         save_parquet_to_gcs(bucket, GCS_STAGING_CACHE, data)
         set_metadata_timestamp(bucket, GCS_BQ_REFRESH_METADATA)
         set_metadata_timestamp(bucket, GCS_GCS_REFRESH_METADATA)
+        data = _stamp_generation(data, get_gcs_generation(bucket, GCS_ACTIVE_CACHE))
     
     return data
 
 
+def _is_local_snapshot_current(bucket, local_path, local_data):
+    """
+    Check if the local snapshot can be used instead of downloading
+    
+    With GCS configured, the local snapshot is current while its generation
+    matches the active cache object. Otherwise it expires after CACHE_TTL.
+    """
+    local_generation = get_snapshot_generation(local_data)
+    if bucket is None or local_generation is None:
+        return _is_local_snapshot_fresh(local_path)
+    
+    remote_generation = get_gcs_generation(bucket, GCS_ACTIVE_CACHE)
+    if remote_generation is None or remote_generation == local_generation:
+        return True
+    
+    log_debug(f"GCS generation changed: {local_generation} -> {remote_generation}")
+    return False
+
+
+def _load_master_snapshot(force_remote=False):
+    """
+    Load the master data through the local snapshot shared by all workers
+    
+    One worker downloads, sorts and writes the snapshot; the others
+    memory-map the same file instead of keeping their own decoded copy.
+    The snapshot survives worker restarts and is only replaced when the
+    active GCS object has a new generation.
+    
+    Returns:
+        (table, memory-mapped file, generation). When mapped, the table only
+        holds the dimension columns; otherwise it is the full table, the file
+        is None and generation is the GCS object the rows can be read again
+        from in the same order (None if they were loaded from BigQuery or
+        sorted after loading).
+    """
+    bucket = get_gcs_bucket()
+    local_path = _local_cache_path()
+    
+    with _local_cache_lock():
+        # Level 2: Local snapshot on the instance's disk
+        if not force_remote:
+            data, source = load_arrow_from_local(local_path, DIMENSION_COLUMNS)
+            if data is not None and _is_local_snapshot_current(bucket, local_path, data):
+                return data, source, None
+        
+        remote = _load_remote_snapshot(bucket)
+        data = _sort_for_partitions(remote)
+        
+        if save_arrow_to_local(local_path, data):
+            mapped, source = load_arrow_from_local(local_path, DIMENSION_COLUMNS)
+            if mapped is not None:
+                return mapped, source, None
+        
+        # Only a GCS object that was already sorted (clustered layout) is read
+        # back in the same row order; BigQuery loads are always sorted here
+        return data, None, get_snapshot_generation(data) if data is remote else None
+
+
+def reload_master_data(force_remote=False):
+    """Load a fresh snapshot and swap it into the app-level cache"""
+    with _load_lock:
+        data, source, generation = _load_master_snapshot(force_remote)
+        _set_master_data(data, source, generation)
+        return _app_cache["data"]
+
+
+def _background_reload():
+    global _last_reload_failure, _reload_running, _reload_pending
+    while True:
+        try:
+            reload_master_data()
+            _last_reload_failure = None
+        except Exception as e:
+            _last_reload_failure = datetime.now()
+            log_debug(f"Background reload error: {e}")
+        
+        with _reload_thread_lock:
+            if not _reload_pending:
+                _reload_running = False
+                return
+            _reload_pending = False
+
+
+def start_background_reload(queue_if_running=False):
+    """
+    Reload master data in a background thread
+    
+    The current snapshot keeps serving until the new one is swapped in.
+    If a reload is already running, returns False; with queue_if_running
+    another reload is run once it finishes (e.g. a newer version was
+    announced mid-load).
+    """
+    global _reload_thread, _reload_running, _reload_pending
+    with _reload_thread_lock:
+        if _reload_running:
+            if queue_if_running:
+                _reload_pending = True
+            return False
+        _reload_running = True
+        _reload_thread = threading.Thread(target=_background_reload, name="master-data-reload", daemon=True)
+        _reload_thread.start()
+        return True
+
+
+def signal_new_version(generation=None):
+    """
+    Tell this process that a new active cache version is available
+    
+    Cheap to call: the reload runs in the background, and the loader only
+    downloads if the active object's generation differs from the local one.
+    """
+    log_debug(f"New version available (generation {generation}) - reloading in background")
+    start_background_reload(queue_if_running=True)
+
+
+def _check_remote_version():
+    """Compare the active cache object's generation with the loaded snapshot's"""
+    try:
+        bucket = get_gcs_bucket()
+        remote_generation = get_gcs_generation(bucket, GCS_ACTIVE_CACHE)
+        local_generation = get_snapshot_generation(_app_cache["data"])
+        if remote_generation is not None and remote_generation != local_generation:
+            signal_new_version(remote_generation)
+    except Exception as e:
+        log_debug(f"Version check error: {e}")
+
+
+def _maybe_check_remote_version():
+    """
+    Poll the active cache object's generation at most every GCS_VERSION_CHECK_INTERVAL
+    
+    Lets every instance pick up a refresh made elsewhere without a short
+    CACHE_TTL. The check runs in the background so requests never wait on it.
+    """
+    global _last_version_check
+    if not GCS_BUCKET_NAME:
+        return
+    now = time.monotonic()
+    with _version_check_lock:
+        if _last_version_check is not None and now - _last_version_check < GCS_VERSION_CHECK_INTERVAL:
+            return
+        _last_version_check = now
+    threading.Thread(target=_check_remote_version, name="master-data-version-check", daemon=True).start()
+
+
+def get_master_data():
+    """
+    Get master data with caching (stale-while-revalidate)
+    
+    Returns:
+        Table of the dimension columns; metric columns are loaded on demand
+        (see _select_rows and get_master_table)
+    """
+    cache = _app_cache
+    
+    # Level 1: App-level cache
+    if cache["data"] is not None:
+        _maybe_check_remote_version()
+        if not _is_cache_valid():
+            retry_ok = (
+                _last_reload_failure is None
+                or (datetime.now() - _last_reload_failure).total_seconds() >= RELOAD_RETRY_INTERVAL
+            )
+            if retry_ok and start_background_reload():
+                log_debug("Cache expired - serving stale data while reloading")
+        return cache["data"]
+    
+    # Cold start: wait for a reload already in flight (e.g. startup warm-up)
+    reload_thread = _reload_thread
+    if reload_thread is not None and reload_thread.is_alive():
+        reload_thread.join()
+    
+    # Single flight: one thread loads, concurrent callers wait and reuse it
+    with _load_lock:
+        if _app_cache["data"] is not None:
+            return _app_cache["data"]
+        data, source, generation = _load_master_snapshot()
+        _set_master_data(data, source, generation)
+        return _app_cache["data"]
+
+
 def clear_cache():
     """Clear all caches"""
     global _app_cache
-    _app_cache = {"data": None, "loaded_at": None}
+    with _app_cache_lock:
+        _app_cache = {
+            "data": None,
+            "partitions": None,
+            "dimensions": None,
+            "columns": None,
+            "loaded_at": None,
+            "version": _app_cache["version"] + 1,
+        }
+    clear_result_cache()
 
 
-# =============================================================================
-# DATA LOADING FUNCTIONS
-# =============================================================================
+def _current_cache():
+    """Get the app-level cache entry of the current snapshot, loading it if needed"""
+    get_master_data()
+    return _app_cache
 
-def load_date_bounds():
-    """Get min and max dates"""
-    import pyarrow.compute as pc
-    
-    data = get_master_data()
-    if data is None:
-        return {"min_date": None, "max_date": None}
+
+def get_master_table():
+    """
+    Get the full master table (dimension and metric columns), loading it if needed
     
-    dates = data.column("Reporting_Date")
-    min_date = pc.min(dates).as_py()
-    max_date = pc.max(dates).as_py()
+    Evicted heap metric columns are read again to assemble it.
+    """
+    import pyarrow as pa
     
-    if hasattr(min_date, 'date'):
-        min_date = min_date.date()
-    if hasattr(max_date, 'date'):
-        max_date = max_date.date()
+    cache = _current_cache()
+    store = cache["columns"]
+    if store is None:
+        return None
+    if store["mapped"]:
+        return store["table"]
     
-    return {"min_date": min_date, "max_date": max_date}
+    schema = store["schema"]
+    metrics = _get_metric_columns(store, schema.names)
+    return pa.Table.from_arrays(
+        [cache["data"].column(name) if name in DIMENSION_COLUMNS else metrics[name] for name in schema.names],
+        schema=schema,
+    )
 
 
-def load_plan_groups(active_inactive="Active"):
-    """Get unique plans grouped by app"""
-    import pyarrow.compute as pc
+# =============================================================================
+# RESULT CACHE
+# =============================================================================
+
+def _estimate_nbytes(value):
+    """Rough in-memory size of a loader payload"""
+    if hasattr(value, "nbytes"):
+        # Arrow arrays and NumPy views report their buffer sizes
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_nbytes(v) for v in value.values())
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_estimate_nbytes(v) for v in value)
+    if isinstance(value, list):
+        sample = next((v for v in value if v is not None), None)
+        return sys.getsizeof(value) + len(value) * sys.getsizeof(sample)
+    return sys.getsizeof(value)
+
+
+def _normalize_filter_value(name, value):
+    """Normalize a loader argument into a hashable cache key part"""
+    if name == "plans":
+        return tuple(sorted(set(value or [])))
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def clear_result_cache():
+    """Drop all cached pivot/chart payloads"""
+    with _result_cache_lock:
+        _result_cache.clear()
+        _result_cache_stats["bytes"] = 0
+
+
+def cached_result(func):
+    """
+    Memoize a data loader by its normalized filters and the data version
     
-    data = get_master_data()
-    if data is None:
-        return {"App_Name": [], "Plan_Name": []}
+    Cached payloads are shared between callers and must not be mutated.
+    """
+    signature = inspect.signature(func)
     
-    mask = pc.equal(data.column("Active_Inactive"), active_inactive)
-    filtered = data.filter(mask)
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # Make sure the master data (and its version) is current
+        get_master_data()
+        
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__, _app_cache["version"]) + tuple(
+            _normalize_filter_value(name, value) for name, value in bound.arguments.items()
+        )
+        
+        with _result_cache_lock:
+            if key in _result_cache:
+                _result_cache.move_to_end(key)
+                _result_cache_stats["hits"] += 1
+                return _result_cache[key][0]
+            _result_cache_stats["misses"] += 1
+        
+        result = func(*args, **kwargs)
+        nbytes = _estimate_nbytes(result)
+        if nbytes > RESULT_CACHE_MAX_BYTES:
+            return result
+        
+        with _result_cache_lock:
+            if key not in _result_cache:
+                _result_cache[key] = (result, nbytes)
+                _result_cache_stats["bytes"] += nbytes
+            while _result_cache_stats["bytes"] > RESULT_CACHE_MAX_BYTES:
+                _, (_, evicted_bytes) = _result_cache.popitem(last=False)
+                _result_cache_stats["bytes"] -= evicted_bytes
+        
+        return result
     
-    app_names = filtered.column("App_Name").to_pylist()
-    plan_names = filtered.column("Plan_Name").to_pylist()
+    return wrapper
+
+
+def _date_range_bounds(partition, start_date, end_date):
+    """
+    Locate [start_date, end_date] in a Reporting_Date-sorted partition
     
-    seen = set()
-    unique_apps = []
-    unique_plans = []
+    Returns:
+        (lo, hi) row positions within the partition
+    """
+    import numpy as np
+    import pyarrow as pa
     
-    for app, plan in zip(app_names, plan_names):
-        if (app, plan) not in seen:
-            seen.add((app, plan))
-            unique_apps.append(app)
-            unique_plans.append(plan)
+    dates = partition.column("Reporting_Date")
+    values = dates.to_numpy()
     
-    sorted_pairs = sorted(zip(unique_apps, unique_plans))
+    lo, hi = 0, len(values)
+    if start_date is not None:
+        bound = np.datetime64(pa.scalar(start_date).cast(dates.type).as_py())
+        lo = int(np.searchsorted(values, bound, side="left"))
+    if end_date is not None:
+        bound = np.datetime64(pa.scalar(end_date).cast(dates.type).as_py())
+        hi = int(np.searchsorted(values, bound, side="right"))
     
-    return {
-        "App_Name": [p[0] for p in sorted_pairs],
-        "Plan_Name": [p[1] for p in sorted_pairs]
-    }
+    return lo, max(hi, lo)
 
 
-def load_pivot_data(start_date, end_date, bc, cohort, plans, metrics, table_type, active_inactive="Active"):
-    """Load data for pivot table"""
+def _project_rows(data, metric_columns, offset, length):
+    """Slice rows of the dimension table and attach the matching metric column slices"""
+    rows = data.slice(offset, length)
+    for name, column in metric_columns.items():
+        rows = rows.append_column(name, column.slice(offset, length))
+    return rows
+
+
+def _select_rows(start_date, end_date, bc, cohort, plans, table_types, active_inactive, metrics=()):
+    """
+    Select master data rows matching the filters
+    
+    Only the partitions for (active_inactive, table_type, bc, cohort) are
+    touched, so the cost tracks the size of the selection. Rows come back
+    grouped by table type in the order given.
+    
+    Returns:
+        Filtered table with the dimension columns and the requested metric
+        columns, or None if no master data is available
+    """
     import pyarrow as pa
     import pyarrow.compute as pc
     
-    data = get_master_data()
-    if data is None:
-        return {"App_Name": [], "Plan_Name": [], "Reporting_Date": []}
+    cache = _current_cache()
+    data = cache["data"]
+    partitions = cache["partitions"]
+    if data is None or partitions is None:
+        return None
     
-    reporting_dates = data.column("Reporting_Date")
+    ranges = []
+    for table_type in table_types:
+        entry = partitions.get((active_inactive, table_type, bc, cohort))
+        if entry is not None:
+            offset, partition = entry
+            lo, hi = _date_range_bounds(partition, start_date, end_date)
+            ranges.append((offset + lo, hi - lo))
     
-    mask = pc.and_(
-        pc.greater_equal(reporting_dates, start_date),
-        pc.less_equal(reporting_dates, end_date)
-    )
-    mask = pc.and_(mask, pc.equal(data.column("BC"), bc))
-    mask = pc.and_(mask, pc.equal(data.column("Cohort"), cohort))
-    mask = pc.and_(mask, pc.equal(data.column("Active_Inactive"), active_inactive))
-    mask = pc.and_(mask, pc.equal(data.column("Table"), table_type))
+    metric_columns = _get_metric_columns(cache["columns"], metrics)
+    slices = [_project_rows(data, metric_columns, offset, length) for offset, length in ranges or [(0, 0)]]
+    filtered = slices[0] if len(slices) == 1 else pa.concat_tables(slices)
     
     if plans:
-        plan_mask = pc.is_in(data.column("Plan_Name"), value_set=pa.array(plans))
-        mask = pc.and_(mask, plan_mask)
+        filtered = filtered.filter(pc.field("Plan_Name").isin(list(plans)))
+    
+    return filtered
+
+
+# =============================================================================
+# DATA LOADING FUNCTIONS
+# =============================================================================
+
+def _get_dimensions():
+    """Get the precomputed dimensions of the current snapshot"""
+    return _current_cache()["dimensions"]
+
+
+def load_date_bounds():
+    """Get min and max dates"""
+    dimensions = _get_dimensions()
+    if dimensions is None:
+        return {"min_date": None, "max_date": None}
     
-    filtered = data.filter(mask)
+    return {"min_date": dimensions["min_date"], "max_date": dimensions["max_date"]}
+
+
+def load_plan_groups(active_inactive="Active"):
+    """Get unique plans grouped by app"""
+    dimensions = _get_dimensions()
+    if dimensions is None:
+        return {"App_Name": [], "Plan_Name": []}
+    
+    group = dimensions["plan_groups"].get(active_inactive, {"App_Name": [], "Plan_Name": []})
+    return {"App_Name": list(group["App_Name"]), "Plan_Name": list(group["Plan_Name"])}
+
+
+def load_filter_values(active_inactive="Active"):
+    """Get the BC and Cohort values present in the data"""
+    dimensions = _get_dimensions()
+    if dimensions is None:
+        return {"BC": [], "Cohort": []}
+    
+    return {
+        "BC": list(dimensions["bc_values"].get(active_inactive, [])),
+        "Cohort": list(dimensions["cohort_values"].get(active_inactive, [])),
+    }
+
+
+def _payload_array(column):
+    """Turn a table column into a single Arrow array for a payload (no Python objects per row)"""
+    return column.combine_chunks()
+
+
+def _pivot_payload(filtered, metrics):
+    """
+    Convert filtered rows into the pivot payload
     
+    Returns:
+        Dict of column name to Arrow array: App_Name and Plan_Name
+        (dictionary-encoded strings), Reporting_Date (date32) and one array
+        per metric
+    """
     result = {
-        "App_Name": filtered.column("App_Name").to_pylist(),
-        "Plan_Name": filtered.column("Plan_Name").to_pylist(),
-        "Reporting_Date": filtered.column("Reporting_Date").to_pylist()
+        "App_Name": _payload_array(filtered.column("App_Name")),
+        "Plan_Name": _payload_array(filtered.column("Plan_Name")),
+        "Reporting_Date": _payload_array(filtered.column("Reporting_Date"))
     }
     
     for metric in metrics:
         if metric in filtered.column_names:
-            result[metric] = filtered.column(metric).to_pylist()
+            result[metric] = _payload_array(filtered.column(metric))
     
     return result
 
 
-def load_chart_data(start_date, end_date, bc, cohort, plans, metric, table_type, active_inactive="Active"):
-    """Load data for a single chart"""
-    import pyarrow as pa
-    import pyarrow.compute as pc
-    
-    data = get_master_data()
-    if data is None:
-        return {"Plan_Name": [], "Reporting_Date": [], "metric_value": []}
+def _aggregate_chart_metrics(filtered, metrics, group_keys=("Plan_Name", "Reporting_Date")):
+    """
+    Sum metrics by group_keys in a single Arrow group-by
     
-    reporting_dates = data.column("Reporting_Date")
+    Returns:
+        Table with the group keys and one column per metric, sorted by the
+        group keys
+    """
+    import pyarrow.compute as pc
     
-    mask = pc.and_(
-        pc.greater_equal(reporting_dates, start_date),
-        pc.less_equal(reporting_dates, end_date)
+    sum_options = pc.ScalarAggregateOptions(skip_nulls=True, min_count=0)
+    aggregated = filtered.group_by(list(group_keys)).aggregate(
+        [(metric, "sum", sum_options) for metric in metrics]
     )
-    mask = pc.and_(mask, pc.equal(data.column("BC"), bc))
-    mask = pc.and_(mask, pc.equal(data.column("Cohort"), cohort))
-    mask = pc.and_(mask, pc.equal(data.column("Active_Inactive"), active_inactive))
-    mask = pc.and_(mask, pc.equal(data.column("Table"), table_type))
-    
-    if plans:
-        plan_mask = pc.is_in(data.column("Plan_Name"), value_set=pa.array(plans))
-        mask = pc.and_(mask, plan_mask)
-    
-    filtered = data.filter(mask)
+    aggregated = aggregated.rename_columns(
+        [name[:-len("_sum")] if name.endswith("_sum") else name for name in aggregated.column_names]
+    )
+    return _decode_dictionaries(aggregated).sort_by([(key, "ascending") for key in group_keys])
+
+
+def _chart_payload(aggregated, metrics):
+    """
+    Convert aggregated chart rows into per-metric chart payloads
     
-    if filtered.num_rows == 0:
-        return {"Plan_Name": [], "Reporting_Date": [], "metric_value": []}
+    Each payload holds Arrow arrays (Plan_Name, Reporting_Date, metric_value)
+    sorted by plan and date; the plan and date arrays are shared between metrics.
+    """
+    empty = {"Plan_Name": [], "Reporting_Date": [], "metric_value": []}
+    if aggregated is None or aggregated.num_rows == 0:
+        return {metric: dict(empty) for metric in metrics}
     
-    plan_names = filtered.column("Plan_Name").to_pylist()
-    dates = filtered.column("Reporting_Date").to_pylist()
-    values = filtered.column(metric).to_pylist()
+    plan_names = _payload_array(aggregated.column("Plan_Name"))
+    dates = _payload_array(aggregated.column("Reporting_Date"))
     
-    # Aggregate
-    aggregated = {}
-    for plan, date, value in zip(plan_names, dates, values):
-        key = (plan, date)
-        if key not in aggregated:
-            aggregated[key] = 0
-        if value is not None:
-            aggregated[key] += value
+    results = {}
+    for metric in metrics:
+        if metric not in aggregated.column_names:
+            results[metric] = dict(empty)
+            continue
+        
+        results[metric] = {
+            "Plan_Name": plan_names,
+            "Reporting_Date": dates,
+            "metric_value": _payload_array(aggregated.column(metric))
+        }
     
-    result_plans, result_dates, result_values = [], [], []
-    for (plan, date), total in sorted(aggregated.items()):
-        result_plans.append(plan)
-        result_dates.append(date)
-        result_values.append(total)
+    return results
+
+
+@cached_result
+def load_pivot_data(start_date, end_date, bc, cohort, plans, metrics, table_type, active_inactive="Active"):
+    """Load data for pivot table"""
+    filtered = _select_rows(start_date, end_date, bc, cohort, plans, [table_type], active_inactive, metrics)
+    if filtered is None:
+        return {"App_Name": [], "Plan_Name": [], "Reporting_Date": []}
     
-    return {
-        "Plan_Name": result_plans,
-        "Reporting_Date": result_dates,
-        "metric_value": result_values
-    }
+    return _pivot_payload(filtered, metrics)
 
 
+def load_chart_data(start_date, end_date, bc, cohort, plans, metric, table_type, active_inactive="Active"):
+    """Load data for a single chart"""
+    return load_all_chart_data(
+        start_date, end_date, bc, cohort, plans, [metric], table_type, active_inactive
+    )[metric]
+
+
+@cached_result
 def load_all_chart_data(start_date, end_date, bc, cohort, plans, metrics, table_type, active_inactive="Active"):
     """Load ALL chart data in ONE pass"""
-    import pyarrow as pa
-    import pyarrow.compute as pc
+    filtered = _select_rows(start_date, end_date, bc, cohort, plans, [table_type], active_inactive, metrics)
+    if filtered is None or filtered.num_rows == 0:
+        return _chart_payload(None, metrics)
     
-    data = get_master_data()
-    if data is None:
-        return {metric: {"Plan_Name": [], "Reporting_Date": [], "metric_value": []} for metric in metrics}
+    available = [metric for metric in metrics if metric in filtered.column_names]
+    return _chart_payload(_aggregate_chart_metrics(filtered, available), metrics)
+
+
+@cached_result
+def load_dashboard_data(start_date, end_date, bc, cohort, plans, pivot_metrics, chart_metrics,
+                        active_inactive="Active", table_types=("Regular", "Crystal Ball")):
+    """
+    Load pivot and chart data for every table type in ONE filter pass
     
-    reporting_dates = data.column("Reporting_Date")
+    Returns:
+        Dict keyed by table type, each with "pivot" and "charts" payloads
+        shaped like load_pivot_data and load_all_chart_data
+    """
+    import pyarrow.compute as pc
     
-    mask = pc.and_(
-        pc.greater_equal(reporting_dates, start_date),
-        pc.less_equal(reporting_dates, end_date)
+    filtered = _select_rows(
+        start_date, end_date, bc, cohort, plans, table_types, active_inactive,
+        list(pivot_metrics) + list(chart_metrics),
     )
-    mask = pc.and_(mask, pc.equal(data.column("BC"), bc))
-    mask = pc.and_(mask, pc.equal(data.column("Cohort"), cohort))
-    mask = pc.and_(mask, pc.equal(data.column("Active_Inactive"), active_inactive))
-    mask = pc.and_(mask, pc.equal(data.column("Table"), table_type))
-    
-    if plans:
-        plan_mask = pc.is_in(data.column("Plan_Name"), value_set=pa.array(plans))
-        mask = pc.and_(mask, plan_mask)
-    
-    filtered = data.filter(mask)
-    
-    if filtered.num_rows == 0:
-        return {metric: {"Plan_Name": [], "Reporting_Date": [], "metric_value": []} for metric in metrics}
+    if filtered is None or filtered.num_rows == 0:
+        return {
+            table_type: {
+                "pivot": {"App_Name": [], "Plan_Name": [], "Reporting_Date": []},
+                "charts": _chart_payload(None, chart_metrics),
+            }
+            for table_type in table_types
+        }
     
-    plan_names = filtered.column("Plan_Name").to_pylist()
-    dates = filtered.column("Reporting_Date").to_pylist()
+    available = [metric for metric in chart_metrics if metric in filtered.column_names]
+    aggregated = _aggregate_chart_metrics(
+        filtered, available, group_keys=("Table", "Plan_Name", "Reporting_Date")
+    )
     
     results = {}
-    for metric in metrics:
-        if metric not in filtered.column_names:
-            results[metric] = {"Plan_Name": [], "Reporting_Date": [], "metric_value": []}
-            continue
-            
-        values = filtered.column(metric).to_pylist()
-        
-        aggregated = {}
-        for plan, date, value in zip(plan_names, dates, values):
-            key = (plan, date)
-            if key not in aggregated:
-                aggregated[key] = 0
-            if value is not None:
-                aggregated[key] += value
-        
-        result_plans, result_dates, result_values = [], [], []
-        for (plan, date), total in sorted(aggregated.items()):
-            result_plans.append(plan)
-            result_dates.append(date)
-            result_values.append(total)
-        
-        results[metric] = {
-            "Plan_Name": result_plans,
-            "Reporting_Date": result_dates,
-            "metric_value": result_values
+    for table_type in table_types:
+        rows = filtered.filter(pc.field("Table") == table_type)
+        chart_rows = aggregated.filter(pc.field("Table") == table_type)
+        results[table_type] = {
+            "pivot": _pivot_payload(rows, pivot_metrics),
+            "charts": _chart_payload(chart_rows, chart_metrics),
         }
     
     return results
@@ -466,45 +1509,126 @@ def load_all_chart_data(start_date, end_date, bc, cohort, plans, metrics, table_
 # REFRESH FUNCTIONS
 # =============================================================================
 
-def refresh_bq_to_staging():
-    """Query BigQuery and save to staging cache."""
+def merge_incremental(base, fresh, since):
+    """
+    Replace every row of base dated on or after since with the fresh rows
+    
+    The result has base's column order and types, without the partition
+    sort flag or GCS generation of the snapshot it came from.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    schema = base.schema.remove_metadata()
+    dates = base.column("Reporting_Date")
+    kept = base.filter(pc.less(dates, pa.scalar(since).cast(dates.type)))
+    
+    fresh = fresh.select(schema.names).cast(schema)
+    return pa.concat_tables([kept.cast(schema), fresh])
+
+
+def _load_incremental_refresh():
+    """
+    Re-query only recent Reporting_Date values and merge them into the active snapshot
+    
+    Returns:
+        (merged table, since date), or None if there is no snapshot to merge into
+    """
+    import pyarrow.compute as pc
+    
+    base = get_master_table()
+    if base is None or base.num_rows == 0:
+        return None
+    
+    max_date = pc.max(base.column("Reporting_Date")).as_py()
+    if max_date is None:
+        return None
+    if hasattr(max_date, 'date'):
+        max_date = max_date.date()
+    
+    since = max_date - timedelta(days=BQ_INCREMENTAL_LOOKBACK_DAYS)
+    fresh = load_from_bigquery(since=since)
+    return merge_incremental(base, fresh, since), since
+
+
+def refresh_bq_to_staging(incremental=BQ_INCREMENTAL_REFRESH):
+    """
+    Query BigQuery and save to staging cache.
+    
+    With incremental=True only rows from BQ_INCREMENTAL_LOOKBACK_DAYS before
+    the active snapshot's latest Reporting_Date are queried and merged in;
+    without an active snapshot a full refresh is done.
+    """
     try:
         log_debug("Starting BQ refresh...")
-        data = load_from_bigquery()
-        
         bucket = get_gcs_bucket()
-        if bucket:
-            save_parquet_to_gcs(bucket, GCS_STAGING_CACHE, data)
-            set_metadata_timestamp(bucket, GCS_BQ_REFRESH_METADATA)
-            return True, "BQ refresh complete. Data saved to staging."
-        return False, "GCS bucket not configured"
+        if not bucket:
+            return False, "GCS bucket not configured"
+        
+        merged = _load_incremental_refresh() if incremental else None
+        if merged is not None:
+            data, since = merged
+            message = f"BQ refresh complete (incremental since {since}). Data saved to staging."
+        else:
+            data = normalize_master_table(load_from_bigquery())
+            message = "BQ refresh complete. Data saved to staging."
+        
+        save_parquet_to_gcs(bucket, GCS_STAGING_CACHE, data)
+        set_metadata_timestamp(bucket, GCS_BQ_REFRESH_METADATA)
+        return True, message
     except Exception as e:
         log_debug(f"BQ refresh error: {e}")
         return False, f"BQ refresh failed: {str(e)}"
 
 
+def _rewrite_blob(source_blob, destination_blob, if_generation_match):
+    """Server-side copy of a GCS object, pinned to the source's current generation"""
+    token, _, _ = destination_blob.rewrite(
+        source_blob,
+        if_generation_match=if_generation_match,
+        if_source_generation_match=source_blob.generation,
+    )
+    # Large objects can take several rewrite calls
+    while token is not None:
+        token, _, _ = destination_blob.rewrite(
+            source_blob,
+            token=token,
+            if_generation_match=if_generation_match,
+            if_source_generation_match=source_blob.generation,
+        )
+    return destination_blob
+
+
 def refresh_gcs_from_staging():
-    """Copy staging cache to active cache."""
-    global _app_cache
+    """
+    Promote staging cache to active cache.
     
+    The copy is done storage-side with generation preconditions, so this
+    process never downloads or re-encodes the data; it only gets a
+    "new version available" signal afterwards.
+    """
     try:
         bucket = get_gcs_bucket()
         if not bucket:
             return False, "GCS bucket not configured"
         
-        staging_blob = bucket.blob(GCS_STAGING_CACHE)
-        if not staging_blob.exists():
+        staging_blob = bucket.get_blob(GCS_STAGING_CACHE)
+        if staging_blob is None:
             return False, "No staging data. Run Refresh BQ first."
         
-        data = load_parquet_from_gcs(bucket, GCS_STAGING_CACHE)
-        if data is None:
-            return False, "Failed to load staging data"
+        from google.api_core.exceptions import PreconditionFailed
+        
+        # 0 means the active object must not exist yet
+        active_generation = get_gcs_generation(bucket, GCS_ACTIVE_CACHE) or 0
+        try:
+            active_blob = _rewrite_blob(staging_blob, bucket.blob(GCS_ACTIVE_CACHE), active_generation)
+        except PreconditionFailed:
+            return False, "GCS refresh failed: cache changed during refresh. Please try again."
         
-        save_parquet_to_gcs(bucket, GCS_ACTIVE_CACHE, data)
         set_metadata_timestamp(bucket, GCS_GCS_REFRESH_METADATA)
         
-        # Clear cache
-        _app_cache = {"data": None, "loaded_at": None}
+        # Keep serving the current snapshot until the new one is loaded
+        signal_new_version(active_blob.generation)
         
         return True, "GCS refresh complete."
     except Exception as e:
@@ -512,11 +1636,11 @@ def refresh_gcs_from_staging():
 
 
 def get_last_bq_refresh():
-    return get_metadata_timestamp(get_gcs_bucket(), GCS_BQ_REFRESH_METADATA)
+    return get_refresh_timestamps().get(GCS_BQ_REFRESH_METADATA)
 
 
 def get_last_gcs_refresh():
-    return get_metadata_timestamp(get_gcs_bucket(), GCS_GCS_REFRESH_METADATA)
+    return get_refresh_timestamps().get(GCS_GCS_REFRESH_METADATA)
 
 
 def format_refresh_timestamp(timestamp):
@@ -524,11 +1648,11 @@ def format_refresh_timestamp(timestamp):
 
 
 def is_staging_ready():
-    bucket = get_gcs_bucket()
-    if not bucket:
+    if get_gcs_bucket() is None:
         return False
-    bq = get_metadata_timestamp(bucket, GCS_BQ_REFRESH_METADATA)
-    gcs = get_metadata_timestamp(bucket, GCS_GCS_REFRESH_METADATA)
+    timestamps = get_refresh_timestamps()
+    bq = timestamps.get(GCS_BQ_REFRESH_METADATA)
+    gcs = timestamps.get(GCS_GCS_REFRESH_METADATA)
     return bq is not None and (gcs is None or bq > gcs)
 
 
@@ -538,13 +1662,37 @@ def get_cache_info():
         "last_bq_refresh": "--", "last_gcs_refresh": "--",
         "staging_ready": False, "rows": 0,
         "gcs_configured": bool(GCS_BUCKET_NAME),
-        "gcs_bucket": GCS_BUCKET_NAME or "Not set"
+        "gcs_bucket": GCS_BUCKET_NAME or "Not set",
+        "result_cache_hits": 0, "result_cache_misses": 0,
+        "result_cache_entries": 0, "result_cache_bytes": 0,
+        "metric_columns_used": 0, "metric_columns_bytes": 0, "metric_column_bytes": {},
+        "metric_columns_mapped": False, "arrow_allocated_bytes": 0,
     }
     try:
+        import pyarrow as pa
+        
         info["last_bq_refresh"] = format_refresh_timestamp(get_last_bq_refresh())
         info["last_gcs_refresh"] = format_refresh_timestamp(get_last_gcs_refresh())
         info["staging_ready"] = is_staging_ready()
         
+        with _result_cache_lock:
+            info["result_cache_hits"] = _result_cache_stats["hits"]
+            info["result_cache_misses"] = _result_cache_stats["misses"]
+            info["result_cache_entries"] = len(_result_cache)
+            info["result_cache_bytes"] = _result_cache_stats["bytes"]
+        
+        # Metric column bytes are mapped file pages used so far when
+        # metric_columns_mapped, else the heap columns currently loaded;
+        # arrow_allocated_bytes is the worker's actual Arrow heap
+        columns = _app_cache["columns"]
+        if columns is not None:
+            with _metric_columns_lock:
+                info["metric_column_bytes"] = dict(columns["bytes"])
+            info["metric_columns_used"] = len(info["metric_column_bytes"])
+            info["metric_columns_bytes"] = sum(info["metric_column_bytes"].values())
+            info["metric_columns_mapped"] = columns["mapped"]
+        info["arrow_allocated_bytes"] = pa.total_allocated_bytes()
+        
         if _app_cache["data"] is not None:
             info["loaded"] = True
             info["rows"] = _app_cache["data"].num_rows
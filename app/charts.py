@@ -19,6 +19,70 @@ def hex_to_rgba(hex_color, opacity=1.0):
     return f"rgba({r}, {g}, {b}, {opacity})"
 
 
+def _to_arrow(values):
+    """Arrow array for a payload column (Arrow array or list), with dictionaries decoded"""
+    import pyarrow as pa
+    
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(values)
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    return values
+
+
+def _series_by_plan(data, subscriptions_data=None):
+    """
+    Split a chart payload into per-plan series sorted by date
+    
+    Works on NumPy views of the payload arrays; no Python objects are made
+    per data point.
+    
+    Returns:
+        Dict of plan -> (dates, values, subs) NumPy arrays; subs is None
+        without subscriptions_data
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    points = pa.table({
+        "Plan_Name": _to_arrow(data["Plan_Name"]),
+        "Reporting_Date": _to_arrow(data["Reporting_Date"]),
+        "metric_value": _to_arrow(data["metric_value"]),
+    })
+    
+    # Line up each point with the Subscriptions value for the same plan and date
+    if subscriptions_data is not None:
+        subs = pa.table({
+            "Plan_Name": _to_arrow(subscriptions_data.get("Plan_Name", [])).cast(points.schema.field("Plan_Name").type),
+            "Reporting_Date": _to_arrow(subscriptions_data.get("Reporting_Date", [])).cast(points.schema.field("Reporting_Date").type),
+            "subs_value": _to_arrow(subscriptions_data.get("metric_value", [])).cast(pa.float64()),
+        })
+        points = points.join(subs, keys=["Plan_Name", "Reporting_Date"], join_type="left outer")
+    
+    points = points.take(pc.sort_indices(points, sort_keys=[
+        ("Plan_Name", "ascending"), ("Reporting_Date", "ascending"), ("metric_value", "ascending"),
+    ]))
+    
+    plan_codes = pc.dictionary_encode(points.column("Plan_Name")).combine_chunks()
+    plans = plan_codes.dictionary.to_pylist()
+    codes = plan_codes.indices.to_numpy()
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(codes)) + 1, [len(codes)]])
+    
+    dates = points.column("Reporting_Date").to_numpy()
+    values = points.column("metric_value").to_numpy()
+    subs_values = points.column("subs_value").to_numpy() if subscriptions_data is not None else None
+    
+    series = {}
+    for start, end in zip(starts[:-1], starts[1:]):
+        series[plans[codes[start]]] = (
+            dates[start:end],
+            values[start:end],
+            subs_values[start:end] if subs_values is not None else None,
+        )
+    return series
+
+
 def build_line_chart(data, display_name, format_type="dollar", date_range=None, 
                      subscriptions_data=None, is_subscriptions_chart=False, theme="dark"):
     """
@@ -49,33 +113,15 @@ def build_line_chart(data, display_name, format_type="dollar", date_range=None,
         )
         return fig, []
     
+    # Organize data by plan (Subscriptions matched by plan and date)
+    plan_data = _series_by_plan(
+        data, subscriptions_data if subscriptions_data and not is_subscriptions_chart else None
+    )
+    
     # Get unique plans and build color map
-    unique_plans = sorted(set(data["Plan_Name"]))
+    unique_plans = sorted(plan_data)
     color_map = build_plan_color_map(unique_plans)
     
-    # Build subscriptions lookup if provided
-    subs_lookup = {}
-    if subscriptions_data and not is_subscriptions_chart:
-        for i in range(len(subscriptions_data.get("Plan_Name", []))):
-            plan = subscriptions_data["Plan_Name"][i]
-            date = subscriptions_data["Reporting_Date"][i]
-            value = subscriptions_data["metric_value"][i]
-            subs_lookup[(plan, date)] = value
-    
-    # Organize data by plan
-    plan_data = {}
-    for i in range(len(data["Plan_Name"])):
-        plan = data["Plan_Name"][i]
-        date = data["Reporting_Date"][i]
-        value = data["metric_value"][i]
-        
-        if plan not in plan_data:
-            plan_data[plan] = {"dates": [], "values": [], "subs": []}
-        plan_data[plan]["dates"].append(date)
-        plan_data[plan]["values"].append(value)
-        subs_value = subs_lookup.get((plan, date), None)
-        plan_data[plan]["subs"].append(subs_value)
-    
     # Create figure
     fig = go.Figure()
     
@@ -85,14 +131,7 @@ def build_line_chart(data, display_name, format_type="dollar", date_range=None,
     # Add trace for each plan
     for plan in unique_plans:
         if plan in plan_data:
-            sorted_data = sorted(zip(
-                plan_data[plan]["dates"], 
-                plan_data[plan]["values"],
-                plan_data[plan]["subs"]
-            ))
-            dates = [p[0] for p in sorted_data]
-            values = [p[1] for p in sorted_data]
-            subs = [p[2] for p in sorted_data]
+            dates, values, subs = plan_data[plan]
             
             base_color = color_map.get(plan, "#6B7280")
             line_color = hex_to_rgba(base_color, LINE_OPACITY)
@@ -18,9 +18,34 @@ BIGQUERY_DATASET = "ICARUS_Multi"
 BIGQUERY_TABLE = "Final_Table"
 BIGQUERY_FULL_TABLE = f"{BIGQUERY_PROJECT}.{BIGQUERY_DATASET}.{BIGQUERY_TABLE}"
 
+# Max parallel BigQuery Storage Read API streams per load
+BQ_STORAGE_MAX_STREAMS = 8
+
+# Incremental BQ refresh (opt-in): re-query only dates within this many days of the
+# active snapshot's latest Reporting_Date and merge them in. Corrections to older
+# rows are only picked up by a full refresh, so the default stays full.
+BQ_INCREMENTAL_REFRESH = False
+BQ_INCREMENTAL_LOOKBACK_DAYS = 7
+
 # Cache TTL (24 hours in seconds)
 CACHE_TTL = 86400
 
+# How often each instance checks the active GCS cache for a new version (seconds)
+GCS_VERSION_CHECK_INTERVAL = 60
+
+# How long BQ/GCS refresh timestamps are cached in-process (seconds)
+GCS_METADATA_TTL = 30
+
+# Max memory for cached pivot/chart results per worker (bytes)
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Max heap for metric columns per worker when the local snapshot could not be
+# memory-mapped (least recently used ones are re-read from GCS when next needed)
+METRIC_COLUMN_BUDGET_BYTES = 512 * 1024 * 1024
+
+# Store percent (rate) metrics as float32 in memory instead of float64
+MASTER_FLOAT32_RATES = False
+
 # Auto refresh time (UTC) - 10:15 AM UTC daily
 AUTO_REFRESH_HOUR = 10
 AUTO_REFRESH_MINUTE = 15
@@ -33,6 +58,17 @@ GCS_STAGING_CACHE = "cache/staging_data.parquet"
 GCS_BQ_REFRESH_METADATA = "cache/bq_last_refresh.txt"
 GCS_GCS_REFRESH_METADATA = "cache/gcs_last_refresh.txt"
 
+# Parquet layout for GCS caches: "clustered" (row groups per Active_Inactive/Table/BC/Cohort,
+# sorted by Reporting_Date, prunable by filter) or "flat" (single unsorted file)
+GCS_PARQUET_LAYOUT = "clustered"
+
+# Local Arrow IPC snapshot shared by all gunicorn workers (under LOCAL_CACHE_DIR).
+# On Cloud Run the filesystem, including /tmp, is in memory: the whole snapshot
+# counts against the instance memory limit (once per instance, not per worker)
+# and its pages are never reclaimed. Point LOCAL_CACHE_DIR at a mounted volume
+# to keep it off instance memory.
+LOCAL_MASTER_CACHE = "master_data.arrow"
+
 # =============================================================================
 # DASHBOARD REGISTRY
 # =============================================================================
@@ -97,6 +133,12 @@ CHART_METRICS = [
     {"display": "Recent CAC", "metric": "Recent_CAC", "agg": "SUM", "format": "dollar"},
 ]
 
+# =============================================================================
+# PIVOT TABLE CONFIGURATION
+# =============================================================================
+# Rows per page of the pivot tables (paged and sorted on the server)
+PIVOT_PAGE_SIZE = 50
+
 # =============================================================================
 # APP COLORS (14 apps - Universal for all charts)
 # =============================================================================
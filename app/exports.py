@@ -0,0 +1,169 @@
+"""
+Pivot Export Endpoints for Variant Analytics Dashboard (Dash Version)
+- Streaming CSV of one pivot table
+- Excel workbook (openpyxl write-only) with the Regular and Crystal Ball pivots as sheets
+- Full pivots for the given filters, regenerated server-side
+"""
+
+from urllib.parse import urlencode
+
+from flask import Response, abort, request, stream_with_context
+
+from auth import can_access_dashboard, get_session_user
+
+# Pivot rows per CSV chunk / Excel write batch
+EXPORT_CHUNK_ROWS = 500
+
+# Bytes per chunk when streaming a finished workbook
+EXPORT_FILE_CHUNK_SIZE = 64 * 1024
+
+TABLE_TYPES = ["Regular", "Crystal Ball"]
+
+
+def get_export_url(fmt, filters, table_type=None):
+    """
+    Build the download URL for the pivots of the given filters
+    
+    Args:
+        fmt: "csv" (one table, table_type) or "xlsx" (both tables)
+        filters: Dict with from_date, to_date, bc, cohort, plans, metrics, active_inactive
+    """
+    params = dict(filters)
+    if table_type is not None:
+        params["table_type"] = table_type
+    return f"/export/pivot.{fmt}?{urlencode(params, doseq=True)}"
+
+
+def _request_filters():
+    """Read the pivot filters from the query string"""
+    args = request.args
+    filters = {
+        "from_date": args.get("from_date"),
+        "to_date": args.get("to_date"),
+        "bc": args.get("bc", type=int),
+        "cohort": args.get("cohort"),
+        "plans": args.getlist("plans"),
+        "metrics": args.getlist("metrics"),
+        "active_inactive": args.get("active_inactive", "Active"),
+    }
+    if not filters["plans"] or not filters["metrics"]:
+        abort(400, "plans and metrics are required")
+    return filters
+
+
+def _load_pivot(filters, table_type):
+    """Get the full pivot DataFrame (shared with the dashboard's pivot cache)"""
+    from pivots import load_pivot_frame
+    
+    df, _ = load_pivot_frame(table_type=table_type, **filters)
+    return df
+
+
+def _export_filename(filters, suffix, ext):
+    name = f"icarus_{filters['active_inactive']}_{suffix}_{filters['from_date']}_{filters['to_date']}"
+    return f"{name.replace(' ', '_').lower()}.{ext}"
+
+
+def _attachment_headers(filename):
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def iter_pivot_csv(df):
+    """Yield a pivot DataFrame as CSV text, header first, EXPORT_CHUNK_ROWS rows at a time"""
+    if df is None:
+        yield "No data available\n"
+        return
+    
+    yield df.iloc[0:0].to_csv(index=False)
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(index=False, header=False)
+
+
+def write_pivot_workbook(sheets, target):
+    """
+    Write pivots to an .xlsx file with openpyxl's write-only mode
+    
+    Rows are streamed to the sheet files as they are appended, so the
+    workbook is never held in memory as cell objects.
+    
+    Args:
+        sheets: List of (sheet title, DataFrame or None)
+        target: Path or binary file object
+    """
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    for title, df in sheets:
+        sheet = workbook.create_sheet(title=title)
+        if df is None:
+            sheet.append(["No data available"])
+            continue
+        
+        sheet.append(list(df.columns))
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+            # NaN is not a valid Excel number; write empty cells instead
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                sheet.append(row)
+    
+    workbook.save(target)
+
+
+def _iter_file(file):
+    """Stream a file in chunks and close it when done"""
+    try:
+        while True:
+            chunk = file.read(EXPORT_FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+def register_export_routes(server):
+    """Register the pivot export routes on the Flask server"""
+    
+    def _require_access():
+        user = get_session_user()
+        if not can_access_dashboard(user, "icarus_historical"):
+            abort(403)
+    
+    @server.route("/export/pivot.csv")
+    def export_pivot_csv():
+        _require_access()
+        filters = _request_filters()
+        table_type = request.args.get("table_type", "Regular")
+        if table_type not in TABLE_TYPES:
+            abort(400, "unknown table_type")
+        
+        df = _load_pivot(filters, table_type)
+        return Response(
+            stream_with_context(iter_pivot_csv(df)),
+            mimetype="text/csv",
+            headers=_attachment_headers(_export_filename(filters, table_type, "csv")),
+        )
+    
+    @server.route("/export/pivot.xlsx")
+    def export_pivot_xlsx():
+        import tempfile
+        
+        _require_access()
+        filters = _request_filters()
+        sheets = [(table_type, _load_pivot(filters, table_type)) for table_type in TABLE_TYPES]
+        
+        # Spooled to disk, then streamed back in chunks
+        file = tempfile.TemporaryFile()
+        try:
+            write_pivot_workbook(sheets, file)
+            file.seek(0)
+        except Exception:
+            file.close()
+            raise
+        
+        return Response(
+            _iter_file(file),
+            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers=_attachment_headers(_export_filename(filters, "pivots", "xlsx")),
+        )
@@ -21,7 +21,7 @@ from dash import Dash, html, dcc, Input, Output, State, callback, no_update
 
 from config import APP_NAME
 from theme import generate_css, get_theme_colors
-from auth import authenticate, is_admin
+from auth import authenticate, is_admin, login_session, logout_session
 
 # Initialize Dash app
 app = Dash(
@@ -127,6 +127,7 @@ def handle_login(n_clicks, username, password):
     
     user = authenticate(username, password)
     if user:
+        login_session(user)
         return user, html.Div("Login successful!", className='alert alert-success')
     else:
         return None, html.Div("Invalid username or password", className='alert alert-danger')
@@ -141,6 +142,7 @@ def handle_login(n_clicks, username, password):
 def handle_logout(n_clicks):
     """Handle logout"""
     if n_clicks:
+        logout_session()
         return None
     return no_update
 
@@ -169,5 +171,13 @@ port = int(os.environ.get('PORT', 8050))
 # Expose server for gunicorn
 server = app.server
 
+# Pivot CSV/Excel downloads (plain Flask routes, outside the callback payload)
+from exports import register_export_routes
+register_export_routes(server)
+
+# Warm the master data in the background so no request pays the cold load
+from bigquery_client import start_background_reload
+start_background_reload()
+
 if __name__ == '__main__':
     app.run_server(debug=False, host='0.0.0.0', port=port)
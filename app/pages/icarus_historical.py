@@ -2,13 +2,22 @@
 ICARUS - Plan (Historical) Dashboard Page for Variant Analytics Dashboard (Dash Version)
 """
 
+import math
+
 from dash import html, dcc, dash_table, callback, Input, Output, State, no_update
 import plotly.graph_objects as go
 from theme import get_theme_colors
-from config import BC_OPTIONS, COHORT_OPTIONS, DEFAULT_BC, DEFAULT_COHORT, DEFAULT_PLAN, CHART_METRICS, METRICS_CONFIG
+from config import (
+    BC_OPTIONS, COHORT_OPTIONS, DEFAULT_BC, DEFAULT_COHORT, DEFAULT_PLAN, CHART_METRICS, METRICS_CONFIG,
+    PIVOT_PAGE_SIZE,
+)
 from colors import build_plan_color_map
 from charts import build_line_chart, build_legend_html
-from pivots import process_pivot_data, get_datatable_columns, get_datatable_style
+from pivots import (
+    get_chart_metric_names, load_pivot_frame, get_datatable_columns, get_datatable_style, get_pivot_page,
+    get_pivot_shape_key,
+)
+from exports import get_export_url
 
 
 def get_plans_by_app(plan_groups):
@@ -22,8 +31,18 @@ def get_plans_by_app(plan_groups):
     return result
 
 
-def create_filter_section(plan_groups, min_date, max_date, colors, prefix=""):
+def get_filter_choices(values, fallback, default):
+    """Dropdown values present in the data (fallback list if none) and the initial value"""
+    values = list(values) or list(fallback)
+    return values, default if default in values else values[0]
+
+
+def create_filter_section(plan_groups, min_date, max_date, colors, prefix="", filter_values=None):
     """Create the filters section"""
+    filter_values = filter_values or {}
+    bc_values, bc_value = get_filter_choices(filter_values.get("BC", []), BC_OPTIONS, DEFAULT_BC)
+    cohort_values, cohort_value = get_filter_choices(filter_values.get("Cohort", []), COHORT_OPTIONS, DEFAULT_COHORT)
+    
     plans_by_app = get_plans_by_app(plan_groups)
     app_names = sorted(plans_by_app.keys())
     
@@ -81,8 +100,8 @@ def create_filter_section(plan_groups, min_date, max_date, colors, prefix=""):
                         html.Div('BILLING CYCLE', className='filter-title'),
                         dcc.Dropdown(
                             id=f'{prefix}bc-select',
-                            options=[{'label': str(bc), 'value': bc} for bc in BC_OPTIONS],
-                            value=DEFAULT_BC,
+                            options=[{'label': str(bc), 'value': bc} for bc in bc_values],
+                            value=bc_value,
                             clearable=False,
                             style={'width': '100%'}
                         ),
@@ -92,8 +111,8 @@ def create_filter_section(plan_groups, min_date, max_date, colors, prefix=""):
                         html.Div('COHORT', className='filter-title'),
                         dcc.Dropdown(
                             id=f'{prefix}cohort-select',
-                            options=[{'label': c, 'value': c} for c in COHORT_OPTIONS],
-                            value=DEFAULT_COHORT,
+                            options=[{'label': c, 'value': c} for c in cohort_values],
+                            value=cohort_value,
                             clearable=False,
                             style={'width': '100%'}
                         ),
@@ -165,6 +184,9 @@ def create_pivot_section(colors, prefix=""):
                 'borderRadius': '8px',
             }),
             html.Div([
+                # Filters the pivot tables were built with (for paging/sorting)
+                dcc.Store(id=f'{prefix}pivot-filters', data=None),
+                
                 # Regular Pivot Table
                 html.H4('📊 Plan Overview (Regular)', style={
                     'color': colors['text_primary'],
@@ -227,11 +249,13 @@ def create_icarus_layout(user, theme='dark'):
     max_date = None
     plan_groups_active = {"App_Name": [], "Plan_Name": []}
     plan_groups_inactive = {"App_Name": [], "Plan_Name": []}
+    filter_values_active = None
+    filter_values_inactive = None
     cache_info = {"last_bq_refresh": "--", "last_gcs_refresh": "--"}
     error_message = None
     
     try:
-        from bigquery_client import load_date_bounds, load_plan_groups, get_cache_info
+        from bigquery_client import load_date_bounds, load_plan_groups, load_filter_values, get_cache_info
         
         date_bounds = load_date_bounds()
         min_date = date_bounds.get("min_date")
@@ -239,6 +263,8 @@ def create_icarus_layout(user, theme='dark'):
         
         plan_groups_active = load_plan_groups("Active")
         plan_groups_inactive = load_plan_groups("Inactive")
+        filter_values_active = load_filter_values("Active")
+        filter_values_inactive = load_filter_values("Inactive")
         cache_info = get_cache_info()
     except Exception as e:
         error_message = str(e)
@@ -309,14 +335,14 @@ def create_icarus_layout(user, theme='dark'):
         
         # Active Tab Content
         html.Div([
-            create_filter_section(plan_groups_active, min_date, max_date, colors, 'active-') if min_date else html.Div('Error loading data'),
+            create_filter_section(plan_groups_active, min_date, max_date, colors, 'active-', filter_values_active) if min_date else html.Div('Error loading data'),
             create_pivot_section(colors, 'active-'),
             create_charts_section(colors, 'active-'),
         ], id='active-content', style={'display': 'block'}),
         
         # Inactive Tab Content
         html.Div([
-            create_filter_section(plan_groups_inactive, min_date, max_date, colors, 'inactive-') if min_date else html.Div('Error loading data'),
+            create_filter_section(plan_groups_inactive, min_date, max_date, colors, 'inactive-', filter_values_inactive) if min_date else html.Div('Error loading data'),
             create_pivot_section(colors, 'inactive-'),
             create_charts_section(colors, 'inactive-'),
         ], id='inactive-content', style={'display': 'none'}),
@@ -332,6 +358,76 @@ def create_icarus_layout(user, theme='dark'):
 # CALLBACKS FOR ICARUS PAGE
 # =============================================================================
 
+def get_pivot_page_count(df):
+    """Number of DataTable pages of a pivot frame"""
+    return max(1, math.ceil(len(df) / PIVOT_PAGE_SIZE))
+
+
+def create_pivot_table(df, date_columns, table_id, theme):
+    """Create a pivot DataTable that is paged and sorted on the server"""
+    return dash_table.DataTable(
+        id=table_id,
+        data=get_pivot_page(df, 0, PIVOT_PAGE_SIZE),
+        columns=get_datatable_columns(date_columns, theme),
+        fixed_columns={'headers': True, 'data': 3},
+        page_action='custom',
+        page_current=0,
+        page_size=PIVOT_PAGE_SIZE,
+        page_count=get_pivot_page_count(df),
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        **get_datatable_style(theme)
+    )
+
+
+def create_export_links(pivot_filters, table_type):
+    """Download links for the full pivot (exported server-side, not just the visible page)"""
+    link_style = {'textDecoration': 'none', 'padding': '4px 12px', 'marginLeft': '8px', 'fontSize': '12px'}
+    return html.Div([
+        html.A('⬇️ CSV', href=get_export_url('csv', pivot_filters, table_type),
+               className='btn-secondary', style=link_style),
+        html.A('⬇️ Excel (both tables)', href=get_export_url('xlsx', pivot_filters),
+               className='btn-secondary', style=link_style),
+    ], style={'display': 'flex', 'justifyContent': 'flex-end', 'marginBottom': '8px'})
+
+
+def register_pivot_paging(app, prefix, table_key, table_type):
+    """
+    Serve pages of a pivot table from the cached pivot frame
+    
+    The frame is rebuilt from the current data if a new snapshot was swapped
+    in since Apply (possibly on another worker or instance). If its dates or
+    row count differ from the tables built at Apply, the headers and page
+    count are sent again so the positional date column ids match the page.
+    """
+    table_id = f'{prefix}pivot-{table_key}-table'
+    
+    @app.callback(
+        [Output(table_id, 'data'),
+         Output(table_id, 'columns'),
+         Output(table_id, 'page_count')],
+        [Input(table_id, 'page_current'),
+         Input(table_id, 'page_size'),
+         Input(table_id, 'sort_by')],
+        [State(f'{prefix}pivot-filters', 'data'),
+         State('icarus-theme', 'data')],
+        prevent_initial_call=True
+    )
+    def page_pivot_table(page_current, page_size, sort_by, pivot_state, theme):
+        if not pivot_state:
+            return no_update, no_update, no_update
+        
+        df, date_columns = load_pivot_frame(table_type=table_type, **pivot_state["filters"])
+        if df is None:
+            return [], no_update, 1
+        
+        page = get_pivot_page(df, page_current or 0, page_size or PIVOT_PAGE_SIZE, sort_by)
+        if get_pivot_shape_key(df, date_columns) == pivot_state["shapes"].get(table_type):
+            return page, no_update, no_update
+        return page, get_datatable_columns(date_columns, theme), get_pivot_page_count(df)
+
+
 def register_icarus_callbacks(app):
     """Register callbacks for the ICARUS page"""
     
@@ -350,7 +446,8 @@ def register_icarus_callbacks(app):
     @app.callback(
         [Output('active-pivot-regular', 'children'),
          Output('active-pivot-crystal', 'children'),
-         Output('active-charts-container', 'children')],
+         Output('active-charts-container', 'children'),
+         Output('active-pivot-filters', 'data')],
         [Input('active-apply-btn', 'n_clicks')],
         [State('active-from-date', 'date'),
          State('active-to-date', 'date'),
@@ -371,7 +468,8 @@ def register_icarus_callbacks(app):
     @app.callback(
         [Output('inactive-pivot-regular', 'children'),
          Output('inactive-pivot-crystal', 'children'),
-         Output('inactive-charts-container', 'children')],
+         Output('inactive-charts-container', 'children'),
+         Output('inactive-pivot-filters', 'data')],
         [Input('inactive-apply-btn', 'n_clicks')],
         [State('inactive-from-date', 'date'),
          State('inactive-to-date', 'date'),
@@ -388,6 +486,11 @@ def register_icarus_callbacks(app):
             'Inactive', theme or 'dark'
         )
     
+    # Pivot tables: server-side paging and sorting
+    for prefix in ('active-', 'inactive-'):
+        register_pivot_paging(app, prefix, 'regular', 'Regular')
+        register_pivot_paging(app, prefix, 'crystal', 'Crystal Ball')
+    
     # BQ Refresh
     @app.callback(
         Output('refresh-message', 'children'),
@@ -424,69 +527,57 @@ def register_icarus_callbacks(app):
 
 def update_dashboard_content(from_date, to_date, bc, cohort, plans, metrics, active_inactive, theme):
     """Update dashboard content with new filter values"""
-    from bigquery_client import load_pivot_data, load_all_chart_data
+    from bigquery_client import load_dashboard_data
     
     colors = get_theme_colors(theme)
     
     # Validation
     if not plans:
         msg = html.Div('⚠️ Please select at least one Plan.', className='alert alert-warning')
-        return msg, msg, msg
+        return msg, msg, msg, None
     
     if not metrics:
         msg = html.Div('⚠️ Please select at least one Metric.', className='alert alert-warning')
-        return msg, msg, msg
+        return msg, msg, msg, None
     
     try:
-        # Load pivot data
-        pivot_regular = load_pivot_data(
-            from_date, to_date, bc, cohort, plans, metrics, 'Regular', active_inactive
-        )
-        pivot_crystal = load_pivot_data(
-            from_date, to_date, bc, cohort, plans, metrics, 'Crystal Ball', active_inactive
+        chart_metric_names = get_chart_metric_names()
+        
+        # Load pivot and chart data for both table types in one pass
+        dashboard_data = load_dashboard_data(
+            from_date, to_date, bc, cohort, plans, metrics, chart_metric_names, active_inactive
         )
         
-        # Process pivot data
-        df_regular, date_cols_regular = process_pivot_data(pivot_regular, metrics, False)
-        df_crystal, date_cols_crystal = process_pivot_data(pivot_crystal, metrics, True)
+        # Full pivots are cached server-side; only the first page is sent
+        pivot_filters = {
+            "from_date": from_date, "to_date": to_date, "bc": bc, "cohort": cohort,
+            "plans": plans, "metrics": metrics, "active_inactive": active_inactive,
+        }
+        df_regular, date_cols_regular = load_pivot_frame(table_type='Regular', **pivot_filters)
+        df_crystal, date_cols_crystal = load_pivot_frame(table_type='Crystal Ball', **pivot_filters)
         
-        # Get datatable styling
-        table_style = get_datatable_style(theme)
+        prefix = f'{active_inactive.lower()}-'
         
         # Create pivot tables
         if df_regular is not None and not df_regular.empty:
-            pivot_regular_component = dash_table.DataTable(
-                data=df_regular.to_dict('records'),
-                columns=get_datatable_columns(date_cols_regular, theme),
-                fixed_columns={'headers': True, 'data': 3},
-                export_format='csv',
-                **table_style
-            )
+            pivot_regular_component = html.Div([
+                create_export_links(pivot_filters, 'Regular'),
+                create_pivot_table(df_regular, date_cols_regular, f'{prefix}pivot-regular-table', theme),
+            ])
         else:
             pivot_regular_component = html.Div('No data available', style={'color': colors['text_secondary']})
         
         if df_crystal is not None and not df_crystal.empty:
-            pivot_crystal_component = dash_table.DataTable(
-                data=df_crystal.to_dict('records'),
-                columns=get_datatable_columns(date_cols_crystal, theme),
-                fixed_columns={'headers': True, 'data': 3},
-                export_format='csv',
-                **table_style
-            )
+            pivot_crystal_component = html.Div([
+                create_export_links(pivot_filters, 'Crystal Ball'),
+                create_pivot_table(df_crystal, date_cols_crystal, f'{prefix}pivot-crystal-table', theme),
+            ])
         else:
             pivot_crystal_component = html.Div('No data available', style={'color': colors['text_secondary']})
         
-        # Load chart data
-        chart_metric_names = [cm["metric"] for cm in CHART_METRICS]
-        if "Subscriptions" not in chart_metric_names:
-            chart_metric_names.append("Subscriptions")
-        
-        all_regular_data = load_all_chart_data(
-            from_date, to_date, bc, cohort, plans, chart_metric_names, 'Regular', active_inactive
-        )
-        all_crystal_data = load_all_chart_data(
-            from_date, to_date, bc, cohort, plans, chart_metric_names, 'Crystal Ball', active_inactive
-        )
+        # Chart data
+        all_regular_data = dashboard_data['Regular']['charts']
+        all_crystal_data = dashboard_data['Crystal Ball']['charts']
         
         subs_regular = all_regular_data.get("Subscriptions", {"Plan_Name": [], "Reporting_Date": [], "metric_value": []})
         subs_crystal = all_crystal_data.get("Subscriptions", {"Plan_Name": [], "Reporting_Date": [], "metric_value": []})
@@ -553,8 +644,17 @@ def update_dashboard_content(from_date, to_date, bc, cohort, plans, metrics, act
         
         charts_container = html.Div(chart_components)
         
-        return pivot_regular_component, pivot_crystal_component, charts_container
+        # Paging callbacks compare the shape keys to detect changed headers since Apply
+        pivot_state = {
+            "filters": pivot_filters,
+            "shapes": {
+                'Regular': get_pivot_shape_key(df_regular, date_cols_regular),
+                'Crystal Ball': get_pivot_shape_key(df_crystal, date_cols_crystal),
+            },
+        }
+        
+        return pivot_regular_component, pivot_crystal_component, charts_container, pivot_state
         
     except Exception as e:
         error_msg = html.Div(f'Error: {str(e)}', className='alert alert-danger')
-        return error_msg, error_msg, error_msg
+        return error_msg, error_msg, error_msg, None
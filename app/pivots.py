@@ -3,29 +3,91 @@ Pivot Table Components for Variant Analytics Dashboard (Dash Version)
 - Using Dash DataTable for AG Grid-like functionality
 - CSV export
 - Frozen columns
+- Cached pivot frames shared by the paged tables and the export routes
 """
 
 import pandas as pd
-from config import METRICS_CONFIG
+from config import METRICS_CONFIG, CHART_METRICS
+from bigquery_client import cached_result
 
 
-def format_metric_value(value, metric_name, is_crystal_ball=False):
-    """Format value based on metric type"""
-    if value is None or pd.isna(value):
-        return None
+# =============================================================================
+# METRIC FORMATTING
+# =============================================================================
+
+def _round_2dp(values):
+    """
+    Round to 2 decimals exactly like Python's round(x, 2)
     
-    config = METRICS_CONFIG.get(metric_name, {})
-    format_type = config.get("format", "number")
-    
-    try:
-        if metric_name == "Rebills" and is_crystal_ball:
-            return round(float(value))
-        
-        if format_type == "percent":
-            return round(float(value) * 100, 2)
-        return round(float(value), 2)
-    except:
-        return None
+    np.round scales by 100 before rounding, so values whose scaled form lands
+    near a .5 boundary (0.005, 0.015, ...) can round the other way. Those few
+    are rounded with Python's round; the rest keep the vectorized result.
+    """
+    import numpy as np
+    
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    tolerance = np.maximum(np.abs(scaled), 1.0) * 1e-9
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= tolerance
+    
+    if near_half.any():
+        rounded[near_half] = [round(float(value), 2) for value in values[near_half]]
+    return rounded
+
+
+def _percent_kernel(values):
+    """Rate -> percent with 2 decimals"""
+    return _round_2dp(values * 100)
+
+
+def _decimal_kernel(values):
+    """2 decimals"""
+    return _round_2dp(values)
+
+
+def _integer_kernel(values):
+    """Whole numbers"""
+    import numpy as np
+    return np.round(values)
+
+
+# Column transform per metric "format" in METRICS_CONFIG
+FORMAT_KERNELS = {
+    "percent": _percent_kernel,
+    "dollar": _decimal_kernel,
+    "number": _decimal_kernel,
+}
+
+# Per-metric transforms that replace the format's on Crystal Ball tables
+CRYSTAL_BALL_KERNELS = {
+    "Rebills": _integer_kernel,
+}
+
+
+def get_metric_kernel(metric_name, is_crystal_ball=False):
+    """Get the column transform that formats a metric for display"""
+    if is_crystal_ball and metric_name in CRYSTAL_BALL_KERNELS:
+        return CRYSTAL_BALL_KERNELS[metric_name]
+    
+    format_type = METRICS_CONFIG.get(metric_name, {}).get("format", "number")
+    return FORMAT_KERNELS.get(format_type, _decimal_kernel)
+
+
+def format_metric_column(values, metric_name, is_crystal_ball=False):
+    """
+    Format a whole column of metric values in one operation
+    
+    Args:
+        values: NumPy array of raw metric values (NaN for missing)
+    
+    Returns:
+        Float64 NumPy array with NaN for missing values
+    """
+    import numpy as np
+    
+    kernel = get_metric_kernel(metric_name, is_crystal_ball)
+    return kernel(values.astype(np.float64, copy=False))
 
 
 def get_display_metric_name(metric_name):
@@ -36,84 +98,192 @@ def get_display_metric_name(metric_name):
     return f"{display}{suffix}"
 
 
+def _codes(values):
+    """Dictionary-encode a payload column (Arrow array or list) into NumPy codes and their values"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(values)
+    encoded = pc.dictionary_encode(values)
+    if isinstance(encoded, pa.ChunkedArray):
+        encoded = encoded.combine_chunks()
+    return encoded.indices.to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist()
+
+
+def _to_numpy(values):
+    """NumPy view of a payload column (Arrow array or list); nulls become NaN"""
+    import numpy as np
+    import pyarrow as pa
+    
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values.to_numpy(zero_copy_only=False)
+    return np.asarray(values)
+
+
 def process_pivot_data(pivot_data, selected_metrics, is_crystal_ball=False):
     """
     Process pivot data into DataFrame for DataTable
     
+    pivot_data holds Arrow arrays (or lists) per column. The long rows are
+    reshaped wide with NumPy indexing into a (plan, metric, date) grid (if
+    a plan has several rows for one date, the last one wins), each metric
+    is formatted as a whole, and the metric axis is unpivoted into rows.
+    Rows are ordered by App, Plan, then the order of selected_metrics.
+    
     Returns:
         DataFrame and list of date columns
     """
+    import numpy as np
+    
     if not pivot_data or "Reporting_Date" not in pivot_data or len(pivot_data["Reporting_Date"]) == 0:
         return None, []
     
     # Get unique dates sorted newest first
-    unique_dates = sorted(set(pivot_data["Reporting_Date"]), reverse=True)
+    date_codes, dates = _codes(pivot_data["Reporting_Date"])
+    date_order = sorted(range(len(dates)), key=lambda i: dates[i], reverse=True)
+    unique_dates = [dates[i] for i in date_order]
+    date_position = np.empty(len(dates), dtype=np.int64)
+    date_position[date_order] = np.arange(len(dates))
     
     # Format dates as MM/DD/YYYY for column headers
     date_columns = []
-    date_map = {}
     for d in unique_dates:
         if hasattr(d, 'strftime'):
             formatted = d.strftime("%m/%d/%Y")
         else:
             formatted = str(d)
         date_columns.append(formatted)
-        date_map[d] = formatted
-    
-    # Get unique App_Name + Plan_Name combinations
-    plan_combos = []
-    seen = set()
-    for i in range(len(pivot_data["App_Name"])):
-        combo = (pivot_data["App_Name"][i], pivot_data["Plan_Name"][i])
-        if combo not in seen:
-            plan_combos.append(combo)
-            seen.add(combo)
-    
-    plan_combos.sort(key=lambda x: (x[0], x[1]))
-    
-    # Build lookup dictionary
-    lookup = {}
-    for i in range(len(pivot_data["Reporting_Date"])):
-        app = pivot_data["App_Name"][i]
-        plan = pivot_data["Plan_Name"][i]
-        date = pivot_data["Reporting_Date"][i]
-        
-        key = (app, plan, date)
-        if key not in lookup:
-            lookup[key] = {}
-        
-        for metric in selected_metrics:
-            if metric in pivot_data:
-                lookup[key][metric] = pivot_data[metric][i]
-    
-    # Build rows
-    rows = []
-    for app_name, plan_name in plan_combos:
-        for metric in selected_metrics:
-            row = {
-                "App": app_name,
-                "Plan": plan_name,
-                "Metric": get_display_metric_name(metric),
-            }
-            
-            for date in unique_dates:
-                formatted_date = date_map[date]
-                key = (app_name, plan_name, date)
-                raw_value = lookup.get(key, {}).get(metric, None)
-                formatted_value = format_metric_value(raw_value, metric, is_crystal_ball)
-                row[formatted_date] = formatted_value
-            
-            rows.append(row)
-    
-    df = pd.DataFrame(rows)
-    
-    # Column order
-    column_order = ["App", "Plan", "Metric"] + date_columns
-    df = df[[c for c in column_order if c in df.columns]]
+    
+    # Get unique App_Name + Plan_Name combinations, sorted
+    app_codes, apps = _codes(pivot_data["App_Name"])
+    plan_codes, plans = _codes(pivot_data["Plan_Name"])
+    plan_count = max(len(plans), 1)
+    pairs, row_pair = np.unique(app_codes.astype(np.int64) * plan_count + plan_codes, return_inverse=True)
+    plan_combos = [(apps[pair // plan_count], plans[pair % plan_count]) for pair in pairs.tolist()]
+    combo_order = sorted(range(len(plan_combos)), key=lambda i: plan_combos[i])
+    plan_combos = [plan_combos[i] for i in combo_order]
+    combo_position = np.empty(len(combo_order), dtype=np.int64)
+    combo_position[combo_order] = np.arange(len(combo_order))
+    
+    # Place every row's values at its (plan, metric, date) cell
+    row_index = combo_position[row_pair.ravel()]
+    column_index = date_position[date_codes]
+    grid = np.full((len(plan_combos), len(selected_metrics), len(unique_dates)), np.nan)
+    for metric_index, metric in enumerate(selected_metrics):
+        if metric in pivot_data:
+            metric_grid = grid[:, metric_index, :]
+            metric_grid[row_index, column_index] = _to_numpy(pivot_data[metric])
+            grid[:, metric_index, :] = format_metric_column(metric_grid, metric, is_crystal_ball)
+    
+    # Unpivot: one row per (plan, metric)
+    labels = pd.DataFrame({
+        "App": np.repeat(np.array([app for app, _ in plan_combos], dtype=object), len(selected_metrics)),
+        "Plan": np.repeat(np.array([plan for _, plan in plan_combos], dtype=object), len(selected_metrics)),
+        "Metric": np.tile(np.array([get_display_metric_name(m) for m in selected_metrics], dtype=object), len(plan_combos)),
+    })
+    values = pd.DataFrame(
+        grid.reshape(len(plan_combos) * len(selected_metrics), len(unique_dates)),
+        columns=date_columns,
+    )
+    df = pd.concat([labels, values], axis=1)
     
     return df, date_columns
 
 
+def get_chart_metric_names():
+    """Metrics loaded for the charts (Subscriptions is always needed for hover data)"""
+    chart_metric_names = [cm["metric"] for cm in CHART_METRICS]
+    if "Subscriptions" not in chart_metric_names:
+        chart_metric_names.append("Subscriptions")
+    return chart_metric_names
+
+
+@cached_result
+def load_pivot_frame(from_date, to_date, bc, cohort, plans, metrics, active_inactive, table_type):
+    """
+    Build the full pivot DataFrame of one table type
+    
+    Cached per filters and data version; pages and sort orders are sliced
+    from the cached frame. Reuses the charts' load_dashboard_data payload.
+    
+    Returns:
+        DataFrame and list of date columns (see process_pivot_data)
+    """
+    from bigquery_client import load_dashboard_data
+    
+    dashboard_data = load_dashboard_data(
+        from_date, to_date, bc, cohort, plans, metrics, get_chart_metric_names(), active_inactive
+    )
+    return process_pivot_data(dashboard_data[table_type]['pivot'], metrics, table_type == 'Crystal Ball')
+
+
+# Leading text columns of every pivot DataFrame (date columns follow)
+PIVOT_LABEL_COLUMNS = ["App", "Plan", "Metric"]
+
+
+def get_date_column_id(index):
+    """
+    DataTable column id of the index-th date column
+    
+    Records repeat every column id in every row, so date columns get their
+    position ("0", "1", ...) as id instead of the MM/DD/YYYY label.
+    """
+    return str(index)
+
+
+def get_pivot_shape_key(df, date_columns):
+    """
+    Key of a pivot's headers and row count
+    
+    Identical in every worker and instance for the same data, unlike the
+    in-process data version, so a page can be checked against the headers
+    sent at Apply. None if there is no pivot.
+    """
+    import hashlib
+    import json
+    
+    if df is None:
+        return None
+    return hashlib.sha1(json.dumps([len(df), list(date_columns)]).encode()).hexdigest()[:16]
+
+
+def get_pivot_column_ids(df):
+    """DataTable column ids for the columns of a pivot DataFrame, in order"""
+    date_count = len(df.columns) - len(PIVOT_LABEL_COLUMNS)
+    return PIVOT_LABEL_COLUMNS + [get_date_column_id(i) for i in range(date_count)]
+
+
+def get_pivot_page(df, page_current, page_size, sort_by=None):
+    """
+    Slice one page of a pivot DataFrame for a DataTable with custom paging/sorting
+    
+    Args:
+        sort_by: DataTable sort_by list ([{"column_id": ..., "direction": "asc"|"desc"}])
+    
+    Returns:
+        List of row records keyed by DataTable column id; empty cells are
+        left out of the record (the DataTable shows them blank)
+    """
+    column_ids = get_pivot_column_ids(df)
+    
+    if sort_by:
+        columns_by_id = dict(zip(column_ids, df.columns))
+        df = df.sort_values(
+            [columns_by_id[s["column_id"]] for s in sort_by],
+            ascending=[s["direction"] == "asc" for s in sort_by],
+            kind="mergesort",
+            na_position="last",
+        )
+    
+    start = page_current * page_size
+    page = df.iloc[start:start + page_size]
+    return [
+        {column_id: value for column_id, value in zip(column_ids, row) if value is not None and value == value}
+        for row in page.itertuples(index=False, name=None)
+    ]
+
+
 def get_datatable_columns(date_columns, theme="dark"):
     """Generate DataTable column definitions"""
     from theme import get_theme_colors
@@ -137,10 +307,10 @@ def get_datatable_columns(date_columns, theme="dark"):
         },
     ]
     
-    for date_col in date_columns:
+    for index, date_col in enumerate(date_columns):
         columns.append({
             "name": date_col,
-            "id": date_col,
+            "id": get_date_column_id(index),
             "type": "numeric",
             "format": {"specifier": ",.2f"}
         })
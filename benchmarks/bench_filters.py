@@ -0,0 +1,216 @@
+"""
+Filter Benchmark for Variant Analytics Dashboard
+- Mask chain (pc.and_ over the whole table, the original loaders)
+- pyarrow.dataset scanner with a pushed-down pc.field expression
+  (in memory, and over a clustered Parquet snapshot)
+- Partition index (_select_rows, what the loaders use)
+- Row-group pruning check of the clustered Parquet snapshot on each
+  partition key
+
+Runs on synthetic data, no GCP access needed:
+    python benchmarks/bench_filters.py --days 730 --plans 60
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import bigquery_client as bq
+from config import METRICS_LIST
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def make_master_table(days, plan_count, seed=0):
+    """Build a master table shaped like Final_Table (one row per date/plan/partition)"""
+    rng = np.random.default_rng(seed)
+    start = date(2023, 1, 1)
+
+    apps = ["AT", "CL", "CN", "JF", "PR"]
+    plans = [(apps[i % len(apps)], f"{apps[i % len(apps)]}{i:03d}") for i in range(plan_count)]
+    partitions = [
+        (status, table, bc, cohort)
+        for status in ("Active", "Inactive")
+        for table in ("Regular", "Crystal Ball")
+        for bc in (3, 4)
+        for cohort in ("7K", "7K_30D")
+    ]
+
+    per_day = len(plans) * len(partitions)
+    rows = days * per_day
+    day_index = np.repeat(np.arange(days), per_day)
+    plan_index = np.tile(np.repeat(np.arange(len(plans)), len(partitions)), days)
+    partition_index = np.tile(np.arange(len(partitions)), days * len(plans))
+
+    columns = {
+        "Reporting_Date": pa.array(np.datetime64(start) + day_index.astype("timedelta64[D]")),
+        "App_Name": pa.array([plans[i][0] for i in range(len(plans))]).take(plan_index),
+        "Plan_Name": pa.array([plans[i][1] for i in range(len(plans))]).take(plan_index),
+        "BC": pa.array([p[2] for p in partitions]).take(partition_index),
+        "Cohort": pa.array([p[3] for p in partitions]).take(partition_index),
+        "Active_Inactive": pa.array([p[0] for p in partitions]).take(partition_index),
+        "Table": pa.array([p[1] for p in partitions]).take(partition_index),
+    }
+    for metric in METRICS_LIST:
+        columns[metric] = pa.array(rng.random(rows) * 100)
+
+    table = pa.table(columns)
+    # Shuffle so the unsorted approaches cannot lean on row order
+    return table.take(pa.array(rng.permutation(rows))), start
+
+
+def mask_chain_select(data, start_date, end_date, bc, cohort, plans, table_type, active_inactive):
+    """Row selection as the loaders originally did it"""
+    reporting_dates = data.column("Reporting_Date")
+    start_date = pa.scalar(start_date).cast(reporting_dates.type)
+    end_date = pa.scalar(end_date).cast(reporting_dates.type)
+
+    mask = pc.and_(
+        pc.greater_equal(reporting_dates, start_date),
+        pc.less_equal(reporting_dates, end_date)
+    )
+    mask = pc.and_(mask, pc.equal(data.column("BC"), bc))
+    mask = pc.and_(mask, pc.equal(data.column("Cohort"), cohort))
+    mask = pc.and_(mask, pc.equal(data.column("Active_Inactive"), active_inactive))
+    mask = pc.and_(mask, pc.equal(data.column("Table"), table_type))
+
+    if plans:
+        plan_mask = pc.is_in(data.column("Plan_Name"), value_set=pa.array(plans))
+        mask = pc.and_(mask, plan_mask)
+
+    return data.filter(mask)
+
+
+def selection_expression(start_date, end_date, bc, cohort, plans, table_types, active_inactive):
+    """The dashboard filters as one pc.field expression, for the dataset scans"""
+    conditions = [
+        pc.field("Active_Inactive") == active_inactive,
+        pc.field("Table").isin(list(table_types)),
+        pc.field("BC") == bc,
+        pc.field("Cohort") == cohort,
+        pc.field("Reporting_Date") >= pa.scalar(start_date).cast(pa.date32()),
+        pc.field("Reporting_Date") <= pa.scalar(end_date).cast(pa.date32()),
+    ]
+    if plans:
+        conditions.append(pc.field("Plan_Name").isin(list(plans)))
+
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def time_it(func, repeat):
+    """Run func repeat times; returns (median ms, last result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def check_row_group_pruning(parquet_path, filters):
+    """
+    Count the row groups of a clustered Parquet file a filter on each key reads
+
+    Returns:
+        True if every filter skipped at least one row group
+    """
+    fragment = next(ds.dataset(parquet_path, format="parquet").get_fragments())
+    total = fragment.num_row_groups
+    pruned = True
+
+    print(f"\n{'row-group pruning':<38}{'read':>12}{'total':>10}")
+    for column, value in filters.items():
+        read = len(fragment.split_by_row_group(pc.field(column) == value))
+        print(f"{column + ' = ' + str(value):<38}{read:>12}{total:>10}")
+        if read >= total:
+            print(f"  !! {column} filter did not skip any row groups")
+            pruned = False
+    return pruned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--plans", type=int, default=60)
+    parser.add_argument("--range-days", type=int, default=90, help="Length of the selected date range")
+    parser.add_argument("--selected-plans", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    bq.DEBUG = False
+
+    raw, first_day = make_master_table(args.days, args.plans)
+    data = bq.normalize_master_table(raw)
+    print(f"Master table: {data.num_rows:,} rows, {data.nbytes / 1e6:,.1f} MB")
+
+    end_date = first_day + timedelta(days=args.days - 1)
+    start_date = end_date - timedelta(days=args.range_days - 1)
+    plans = pc.unique(data.column("Plan_Name")).dictionary.to_pylist()[:args.selected_plans]
+    filters = dict(bc=4, cohort="7K", plans=plans, active_inactive="Active")
+    expression = selection_expression(
+        start_date, end_date, filters["bc"], filters["cohort"], plans, ["Regular"], filters["active_inactive"]
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parquet_path = os.path.join(tmp, "master_data.parquet")
+        bq._write_clustered_parquet(data, parquet_path)
+        parquet_dataset = ds.dataset(parquet_path, format="parquet")
+        memory_dataset = ds.dataset(data)
+
+        bq._set_master_data(bq._sort_for_partitions(data))
+
+        cases = [
+            ("mask chain (pc.and_)", lambda: mask_chain_select(
+                data, start_date, end_date, filters["bc"], filters["cohort"], plans, "Regular", filters["active_inactive"])),
+            ("dataset scan, in memory", lambda: memory_dataset.to_table(filter=expression, use_threads=True)),
+            ("dataset scan, in memory (1 thread)", lambda: memory_dataset.to_table(filter=expression, use_threads=False)),
+            ("dataset scan, clustered Parquet", lambda: parquet_dataset.to_table(filter=expression, use_threads=True)),
+            ("partition index (_select_rows)", lambda: bq._select_rows(
+                start_date, end_date, filters["bc"], filters["cohort"], plans, ["Regular"],
+                filters["active_inactive"], METRICS_LIST)),
+        ]
+
+        print(f"Selection: {args.range_days} days, {len(plans)} plans, BC {filters['bc']}, "
+              f"Cohort {filters['cohort']}, Regular, {filters['active_inactive']}\n")
+        print(f"{'approach':<38}{'median ms':>12}{'rows':>10}")
+        expected_rows = None
+        for name, func in cases:
+            median_ms, result = time_it(func, args.repeat)
+            print(f"{name:<38}{median_ms:>12.2f}{result.num_rows:>10,}")
+            if expected_rows is None:
+                expected_rows = result.num_rows
+            elif result.num_rows != expected_rows:
+                print(f"  !! row count differs from mask chain ({expected_rows:,})")
+
+        pruned = check_row_group_pruning(parquet_path, {
+            "Active_Inactive": filters["active_inactive"], "Table": "Regular",
+            "BC": filters["bc"], "Cohort": filters["cohort"],
+        })
+
+    if not pruned:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()